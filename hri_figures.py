@@ -0,0 +1,314 @@
+"""
+Study figures, rendered on demand into documents/.
+
+Each figure is a function of the participant table with its metrics. A
+figure is only rendered again when the hash of its input columns and of the
+code it runs differs from the one recorded when its PDF was last written, so
+after a data change only the figures that use the changed answers are
+redrawn. The code hashed is the figure's own function, everything else in
+this module except the other figures' functions, and hri_metrics and
+hri_stats. The hashes and the statistics tables written with the figures
+are kept in CACHE_DIR, which is not tracked. Figures that need rendering are drawn in parallel processes, and
+seaborn and matplotlib are only imported by the processes that draw.
+
+Usage:
+    python hri_figures.py                      # every out-of-date figure
+    python hri_figures.py composite_means --force
+    python hri_figures.py --list
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+OUT_DIR = ROOT / "documents"
+
+# Hashes of the rendered figures and the statistics tables of the last run
+CACHE_DIR = ROOT / ".figure-cache"
+HASH_FILE = "figure_hashes.json"
+
+GROUP_COL, GENDER_COL = "study_type", "participant_gender"
+COMPOSITE_VARS = ["Influence_mean", "Anthropomorphism_mean",
+                  "Animacy_mean", "Likeability_mean"]
+TITLES = ["Influence Composite", "Anthropomorphism",
+          "Animacy", "Likeability"]
+
+
+def _plotting():
+    """Import the plotting libraries, only done by the processes that draw"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set(style="whitegrid")
+    return sns, plt
+
+
+def _behaviour_palette(sns):
+    return {"CONTROL": sns.color_palette("Set2")[0],
+            "RISK":    sns.color_palette("Set2")[1]}
+
+
+def _save(fig, out_path):
+    fig.savefig(out_path, bbox_inches="tight", pad_inches=0.02)
+
+
+def plot_overview(wide_df, out_path):
+    sns, plt = _plotting()
+    fig, axes = plt.subplots(1,2, figsize=(12,4))
+
+    # Participants by NAO Behaviour × gender
+    sns.countplot(data=wide_df, x=GROUP_COL, hue=GENDER_COL, palette="Set2", ax=axes[0])
+    axes[0].set_title("Participants by NAO Behaviour & Gender")
+    axes[0].set_xlabel("NAO Behaviour"); axes[0].set_ylabel("Count")
+    axes[0].legend(title="Participant Gender")
+
+    # RPS histogram
+    sns.histplot(wide_df["RPS_score"], bins=range(1,10), color="goldenrod", ax=axes[1])
+    axes[1].set_title("Distribution of RPS Scores (1–9)")
+    axes[1].set_xlabel("Mean RPS"); axes[1].set_ylabel("Frequency")
+    axes[1].set_xlim(1,9)
+    axes[1].set_ylim(bottom=0)
+
+    fig.tight_layout()
+    _save(fig, out_path)
+
+
+def plot_composite_means(wide_df, out_path):
+    from hri_metrics import COMPOSITES
+    from hri_stats import compare_all, format_result
+    sns, plt = _plotting()
+    palette = _behaviour_palette(sns)
+
+    # CONTROL − RISK: bootstrap 95% CI, permutation p-value and Hedges' g (seeded)
+    group_stats = compare_all(wide_df, GROUP_COL, list(COMPOSITES), groups=("CONTROL","RISK"))
+    print(group_stats.round(3).to_string())
+
+    fig, axes = plt.subplots(2,2, figsize=(10,8), sharey=True)
+    axes = axes.flatten()
+
+    for ax, var, title in zip(axes, COMPOSITE_VARS, TITLES):
+        melt = wide_df[[GROUP_COL, var]].dropna()
+        sns.barplot(data=melt, x=GROUP_COL, y=var, palette=palette, ci=None, ax=ax)
+        stats = melt.groupby(GROUP_COL)[var].agg(["mean","std"])
+        for i, (cond,row) in enumerate(stats.iterrows()):
+            ax.errorbar(i, row["mean"], yerr=row["std"],
+                        fmt='none', ecolor='black', capsize=6, capthick=1, lw=1)
+        ax.set_title(f"{title}\n{format_result(group_stats.loc[var])}", fontsize=10)
+        ax.set_ylim(1,5)
+        ax.set_xlabel(""); ax.set_ylabel("Likert Mean")
+        ax.set_xticklabels(["CONTROL","RISK"])
+
+    fig.suptitle("Composite Ratings (Mean ± SD) by NAO Behaviour", fontsize=14)
+    fig.tight_layout(rect=[0,0.03,1,0.95])
+    _save(fig, out_path)
+    group_stats.to_csv(CACHE_DIR / "composite_stats.csv")
+
+
+def plot_composite_distributions(wide_df, out_path):
+    sns, plt = _plotting()
+    fig, axes = plt.subplots(2,2, figsize=(10,8))
+    axes = axes.flatten()
+    bin_edges = [1,2,3,4,5,6]  # width 1 bins
+
+    for ax, var, title in zip(axes, COMPOSITE_VARS, TITLES):
+        for cond,color in _behaviour_palette(sns).items():
+            sns.histplot(wide_df[wide_df[GROUP_COL]==cond][var],
+                         bins=bin_edges, alpha=0.5, ax=ax, color=color,
+                         label=cond if var=="Influence_mean" else "")
+        ax.set_title(f"{title} Distribution")
+        ax.set_xlabel("Mean Rating"); ax.set_ylabel("Frequency")
+        ax.set_xlim(1,5); ax.set_ylim(0,7)
+        if var=="Influence_mean":
+            ax.legend(title="NAO Behaviour")
+
+    fig.suptitle("Composite Score Distributions by NAO Behaviour", fontsize=14)
+    fig.tight_layout(rect=[0,0.03,1,0.95])
+    _save(fig, out_path)
+
+
+def plot_rps_vs_influence(wide_df, out_path):
+    sns, plt = _plotting()
+    fig = plt.figure(figsize=(6,5))
+    sns.scatterplot(data=wide_df, x="RPS_score", y="Influence_mean",
+                    hue=GROUP_COL, palette=_behaviour_palette(sns), s=90)
+    plt.xlabel("RPS Score (1–9)"); plt.ylabel("Influence Composite (1–5)")
+    plt.title("RPS vs. Perceived Influence by NAO Behaviour")
+    plt.xlim(1,9); plt.ylim(1,5)
+    plt.legend(title="NAO Behaviour")
+    plt.tight_layout()
+    _save(fig, out_path)
+
+
+def plot_influence_rps_objective_measure(wide_df, out_path):
+    from hri_stats import compare_all, format_result
+    sns, plt = _plotting()
+
+    # Risk Adverse − Risky: bootstrap 95% CI, permutation p-value and Hedges' g (seeded)
+    strategy_stats = compare_all(wide_df, "User Strategy", ["Influence_mean", "RPS_score"],
+                                 groups=("Risk Adverse", "Risky"))
+    print(strategy_stats.round(3).to_string())
+
+    # Palette blue & yellow
+    palette = {"Risk Adverse": "#1F77B4",  # yellow
+               "Risky":        "#FDBE35"}  # blue
+
+    fig, axes = plt.subplots(1,2, figsize=(12,4), sharey=True)
+
+    # Influence composite distribution
+    for grp,color in palette.items():
+        sns.histplot(data=wide_df[wide_df["User Strategy"]==grp],
+                     x="Influence_mean", bins=[1,2,3,4,5,6], color=color,
+                     alpha=0.7, ax=axes[0], label=grp)
+    axes[0].set_xlim(1,5)
+    axes[0].set_xlabel("Influence Composite (1–5)")
+    axes[0].set_ylabel("Frequency")
+    axes[0].set_title(f"Influence Composite\n{format_result(strategy_stats.loc['Influence_mean'])}", fontsize=10)
+    axes[0].legend(title="User Strategy")
+
+    # RPS distribution
+    for grp,color in palette.items():
+        sns.histplot(data=wide_df[wide_df["User Strategy"]==grp],
+                     x="RPS_score", bins=range(1,10), color=color,
+                     alpha=0.7, ax=axes[1])
+    axes[1].set_xlim(1,9)
+    axes[1].set_xlabel("RPS Score (1–9)")
+    axes[1].set_title(f"Risk Propensity Scale\n{format_result(strategy_stats.loc['RPS_score'])}", fontsize=10)
+
+    # Uniform y-axis
+    max_freq=max(ax.get_ylim()[1] for ax in axes)
+    for ax in axes:
+        ax.set_ylim(0, max_freq)
+
+    fig.suptitle("Influence & RPS Distributions by User Strategy", y=1.05)
+    fig.tight_layout()
+    _save(fig, out_path)
+    strategy_stats.to_csv(CACHE_DIR / "influence_rps_objective_stats.csv")
+
+
+# Figure name -> drawing function, PDF written and the columns it reads
+FIGURES = {
+    "overview": {
+        "plot": plot_overview, "file": "overview.pdf",
+        "columns": [GROUP_COL, GENDER_COL, "RPS_score"]},
+    "composite_means": {
+        "plot": plot_composite_means, "file": "composite_means.pdf",
+        "columns": [GROUP_COL, "RPS_score"] + COMPOSITE_VARS},
+    "composite_distributions": {
+        "plot": plot_composite_distributions, "file": "composite_distributions.pdf",
+        "columns": [GROUP_COL] + COMPOSITE_VARS},
+    "rps_vs_influence": {
+        "plot": plot_rps_vs_influence, "file": "rps_vs_influence.pdf",
+        "columns": [GROUP_COL, "RPS_score", "Influence_mean"]},
+    "influence_rps_objective_measure": {
+        "plot": plot_influence_rps_objective_measure, "file": "influence_rps_objective_measure.pdf",
+        "columns": ["User Strategy", "RPS_score", "Influence_mean"]},
+}
+
+
+def code_sources(name):
+    """Source of the code a figure runs: this module without the other figures, hri_metrics and hri_stats"""
+    import hri_metrics
+    import hri_stats
+    plot = FIGURES[name]["plot"]
+    module = inspect.getsource(inspect.getmodule(plot))
+    for figure in FIGURES.values():
+        if figure["plot"] is not plot:
+            module = module.replace(inspect.getsource(figure["plot"]), "")
+    return [module, inspect.getsource(hri_metrics), inspect.getsource(hri_stats)]
+
+
+def figure_hash(name, wide_df):
+    """Hash of a figure's input columns and of the code it runs"""
+    from hri_metrics import snapshot_key
+    digest = hashlib.sha1(snapshot_key(wide_df[FIGURES[name]["columns"]]).encode("ascii"))
+    for source in code_sources(name):
+        digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _render(name, data, out_path):
+    FIGURES[name]["plot"](data, out_path)
+    return name
+
+
+def render(names=None, out_dir=OUT_DIR, force=False, workers=None):
+    """Render the figures whose PDF is missing or out of date
+
+    Args:
+        names (list): Figures to consider, all of FIGURES by default
+        out_dir (Path): Directory of the PDFs
+        force (bool): Render even when up to date
+        workers (int): Drawing processes, by default one per figure up to the CPU count
+
+    Returns:
+        list: Names of the figures rendered
+    """
+    from hri_metrics import compute_metrics
+    from hri_results import load_wide
+
+    names = list(FIGURES) if not names else names
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR.mkdir(exist_ok=True)
+    # Hashes are kept per output directory, so renders elsewhere do not mark these PDFs current
+    hash_path = CACHE_DIR / HASH_FILE
+    try:
+        all_hashes = json.loads(hash_path.read_text())
+    except (OSError, ValueError):
+        all_hashes = {}
+    hashes = all_hashes.setdefault(str(out_dir.resolve()), {})
+
+    wide_df = compute_metrics(load_wide())
+    todo = {}
+    for name in names:
+        digest = figure_hash(name, wide_df)
+        out_path = out_dir / FIGURES[name]["file"]
+        if force or hashes.get(name) != digest or not out_path.exists():
+            todo[name] = digest
+        else:
+            print(f"{out_path} is up to date")
+    if not todo:
+        return []
+
+    workers = workers or min(len(todo), os.cpu_count() or 1)
+    jobs = [(name, wide_df[FIGURES[name]["columns"]], out_dir / FIGURES[name]["file"]) for name in todo]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            done = list(pool.map(_render, *zip(*jobs)))
+    else:
+        done = [_render(*job) for job in jobs]
+
+    for name in done:
+        hashes[name] = todo[name]
+        print(f"Saved {out_dir / FIGURES[name]['file']}")
+    hash_path.write_text(json.dumps(all_hashes, indent=2, sort_keys=True) + "\n")
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the study figures")
+    parser.add_argument("figures", nargs="*", metavar="figure", help="figures to render, default: all")
+    parser.add_argument("--out", default=str(OUT_DIR), help="directory of the PDFs")
+    parser.add_argument("--force", action="store_true", help="render even when up to date")
+    parser.add_argument("--workers", type=int, default=None, help="drawing processes")
+    parser.add_argument("--list", action="store_true", help="list the figures and exit")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.figures if name not in FIGURES]
+    if unknown:
+        parser.error(f"unknown figures {unknown}, choose from {list(FIGURES)}")
+
+    if args.list:
+        for name, figure in FIGURES.items():
+            print(f"{name:32} {figure['file']}")
+        return
+    render(args.figures, args.out, args.force, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Participant metrics shared by data_analysis.py and data_analysis_2.py.
+
+compute_metrics() takes the participant x question table of
+hri_results.load_wide() and adds the composite scores, the share of risky
+choices in the game (Risk_prop) and the User Strategy category. Every step
+works on whole columns: answers to the game's turns are turned into codes
+through their categories, so the Python-level work grows with the number of
+distinct answers, not of participants, and millions of simulated
+participants take one pass over the arrays.
+
+Results are kept for the last few tables seen, keyed by a hash of their
+contents, so re-running a figure on unchanged data does not recompute them.
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+RISK_VARS      = [f"risk_q{i}" for i in range(1,8)]
+INFLUENCE_VARS = [f"influence_{i}" for i in range(1,5)]
+ANTHRO_VARS    = [f"anthropomorphism_{i}" for i in range(1,6)]
+ANIMACY_VARS   = [f"animacy_{i}" for i in range(1,7)]
+LIKE_VARS      = [f"likeability_{i}" for i in range(1,6)]
+
+# Composite column -> the Likert items it averages
+COMPOSITES = {
+    "RPS_score":             RISK_VARS,
+    "Influence_mean":        INFLUENCE_VARS,
+    "Anthropomorphism_mean": ANTHRO_VARS,
+    "Animacy_mean":          ANIMACY_VARS,
+    "Likeability_mean":      LIKE_VARS,
+}
+
+# Options of each turn, (less risky, more risky)
+TURN_OPTIONS = {
+    "turn_1": ("lockdown", "monitor"),
+    "turn_2": ("health", "order"),
+    "turn_3": ("vaccine", "lie"),
+    "turn_4": ("emergency", "disinformation"),
+    "turn_5": ("equity", "unequal"),
+}
+
+# User Strategy categories, by code: Risk_prop of at most 0.5 is risk adverse
+STRATEGIES = ["Risk Adverse", "Risky"]
+
+# Tables whose metrics are kept
+CACHE_SIZE = 4
+
+_cache = OrderedDict()
+
+
+def numeric_items(wide_df):
+    """Likert items present in the table, converted to numbers with unreadable answers as NaN"""
+    items = [c for vars in COMPOSITES.values() for c in vars if c in wide_df.columns]
+    return wide_df[items].apply(pd.to_numeric, errors="coerce")
+
+
+def composite_scores(items):
+    """Mean of the answered items of each composite"""
+    return pd.DataFrame({name: items[[c for c in vars if c in items.columns]].mean(axis=1)
+                         for name, vars in COMPOSITES.items()}, index=items.index)
+
+
+def turn_codes(wide_df):
+    """Risk code of every turn answer: 0 less risky, 1 more risky, -1 unanswered or unknown
+
+    Returns:
+        numpy.ndarray: int8 array of participants x turns
+    """
+    codes = np.full((len(wide_df), len(TURN_OPTIONS)), -1, dtype=np.int8)
+    for i, (turn, options) in enumerate(TURN_OPTIONS.items()):
+        if turn not in wide_df.columns:
+            continue
+        answers = wide_df[turn].astype("category")
+        # Code of each distinct answer, the extra last entry is for missing answers (code -1)
+        lookup = np.array([options.index(a) if a in options else -1
+                           for a in answers.cat.categories.astype(str).str.lower()] + [-1], dtype=np.int8)
+        codes[:, i] = lookup[answers.cat.codes.to_numpy()]
+    return codes
+
+
+def risk_prop(codes):
+    """Share of risky choices among the known answers, NaN without any"""
+    answered = (codes >= 0).sum(axis=1)
+    risky = (codes == 1).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(answered > 0, risky / answered, np.nan)
+
+
+def user_strategy(prop):
+    """Categorical User Strategy of each Risk_prop, NaN stays uncategorised"""
+    codes = np.where(np.isnan(prop), -1, prop > 0.5).astype(np.int8)
+    return pd.Categorical.from_codes(codes, categories=STRATEGIES)
+
+
+def snapshot_key(wide_df):
+    """Hash of the table's index, columns and values"""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(wide_df, index=True).to_numpy().tobytes())
+    digest.update(repr(list(wide_df.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compute_metrics(wide_df):
+    """Return a copy of the table with numeric Likert items and every metric added
+
+    Adds the COMPOSITES columns, Risk_prop and User Strategy, and makes
+    study_type and participant_gender categorical.
+
+    Args:
+        wide_df (pandas.DataFrame): Participant x question table
+
+    Returns:
+        pandas.DataFrame: The table with its metrics
+    """
+    key = snapshot_key(wide_df)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key].copy()
+
+    result = wide_df.copy()
+    items = numeric_items(wide_df)
+    result[items.columns] = items
+    scores = composite_scores(items)
+    result[scores.columns] = scores
+    prop = risk_prop(turn_codes(wide_df))
+    result["Risk_prop"] = prop
+    result["User Strategy"] = user_strategy(prop)
+    for col in ("study_type", "participant_gender"):
+        if col in result.columns:
+            result[col] = result[col].astype("category")
+
+    _cache[key] = result
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result.copy()
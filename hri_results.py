@@ -0,0 +1,204 @@
+"""
+Study results store shared by data_analysis.py and data_analysis_2.py.
+
+Every session of the game leaves a src/game/saves/results_<timestamp>.csv of
+Question,Answer rows. ingest() appends new session files to an SQLite store
+that already holds the wide participant x question table, one row per
+participant and one column per question, with numeric answers stored as
+numbers. Files are recorded with their size and modification time, so a
+re-run only reads the files added or changed since the last one, and
+load_wide() reads the table back without any reshaping.
+
+Participants are numbered in session order, so the IDs match those of the
+merged hri-results.csv. When there are no session files, the merged file is
+ingested instead, keeping its participant_id column.
+
+Usage:
+    python hri_results.py                       # ingest new sessions
+    python hri_results.py --export hri-results.csv
+"""
+
+import argparse
+import csv
+import os
+import re
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+STORE_PATH = ROOT / "hri-results.sqlite"
+SESSIONS_DIR = ROOT / "src" / "game" / "saves"
+MERGED_PATH = ROOT / "hri-results.csv"
+
+# Columns of the participants table that are not answers
+BOOKKEEPING = ("participant_id", "session", "source")
+
+_NUMBER = re.compile(r"-?\d+(\.\d*)?")
+
+
+def default_sources():
+    """Session results files in session order, or the merged file when there are none
+
+    Only finished sessions have a results_*.csv; the partial_*.csv files of
+    unfinished ones are left out.
+    """
+    sessions = sorted(SESSIONS_DIR.glob("results_*.csv"))
+    return sessions if sessions else [MERGED_PATH]
+
+
+def typed(answer):
+    """Store numeric answers as numbers so the columns load as numeric"""
+    if _NUMBER.fullmatch(answer):
+        return float(answer) if "." in answer else int(answer)
+    return answer
+
+
+def open_store(path=STORE_PATH):
+    """Open the store, creating its tables on first use"""
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE IF NOT EXISTS participants "
+                 "(participant_id INTEGER PRIMARY KEY, session TEXT, source TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS ingested "
+                 "(source TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER)")
+    return conn
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _read_sessions(path):
+    """Read a results file into {participant_id or None: [(question, answer), ...]}"""
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        reader = csv.DictReader(csvfile)
+        merged = "participant_id" in (reader.fieldnames or [])
+        sessions = {}
+        for row in reader:
+            participant = int(row["participant_id"]) if merged else None
+            sessions.setdefault(participant, []).append((row["Question"], row["Answer"]))
+    return sessions
+
+
+def _add_columns(conn, questions):
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(participants)")}
+    for question in questions:
+        if question not in existing:
+            # No declared type, so each value keeps the type it was stored with
+            conn.execute(f"ALTER TABLE participants ADD COLUMN {_quote(question)}")
+            existing.add(question)
+
+
+def ingest_file(conn, path):
+    """Add the participants of a results file to the store, replacing earlier rows from it
+
+    A session file keeps the participant ID it was given when first
+    ingested, or gets the next free one.
+
+    Returns:
+        int: Participants written
+    """
+    source = path.name
+    previous = [row[0] for row in conn.execute(
+        "SELECT participant_id FROM participants WHERE source = ? ORDER BY participant_id", (source,))]
+    conn.execute("DELETE FROM participants WHERE source = ?", (source,))
+    written = 0
+    for participant, answers in _read_sessions(path).items():
+        if participant is None:
+            participant = previous[0] if previous else conn.execute(
+                "SELECT COALESCE(MAX(participant_id), 0) + 1 FROM participants").fetchone()[0]
+            session = path.stem[len("results_"):]
+        else:
+            session = str(participant)
+        answers = dict(answers)  # A repeated question keeps its last answer
+        _add_columns(conn, answers)
+        columns = list(BOOKKEEPING) + list(answers)
+        conn.execute(
+            f"INSERT OR REPLACE INTO participants ({', '.join(_quote(c) for c in columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            [participant, session, source] + [typed(answer) for answer in answers.values()])
+        written += 1
+    return written
+
+
+def ingest(sources=None, store=STORE_PATH):
+    """Add results files that are new or changed since the last run to the store
+
+    Args:
+        sources (list): Results files, by default those of default_sources()
+        store (Path): SQLite file of the store
+
+    Returns:
+        tuple: (files ingested, participants written)
+    """
+    sources = default_sources() if sources is None else [Path(p) for p in sources]
+    files = participants = 0
+    with closing(open_store(store)) as conn:
+        seen = {row[0]: (row[1], row[2]) for row in conn.execute("SELECT source, size, mtime_ns FROM ingested")}
+        for path in sources:
+            if not path.exists():
+                continue
+            stat = path.stat()
+            if seen.get(path.name) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            with conn:  # One transaction per file
+                participants += ingest_file(conn, path)
+                conn.execute("INSERT OR REPLACE INTO ingested VALUES (?, ?, ?)",
+                             (path.name, stat.st_size, stat.st_mtime_ns))
+            files += 1
+    return files, participants
+
+
+def load_wide(sources=None, store=STORE_PATH):
+    """Ingest new results and return the participant x question table
+
+    Returns:
+        pandas.DataFrame: Indexed by participant_id, one column per question,
+            like long_df.pivot(index="participant_id", columns="Question", values="Answer")
+    """
+    import pandas as pd
+
+    ingest(sources, store)
+    with closing(open_store(store)) as conn:
+        wide_df = pd.read_sql_query("SELECT * FROM participants ORDER BY participant_id", conn,
+                                    index_col="participant_id")
+    wide_df = wide_df.drop(columns=[c for c in BOOKKEEPING if c in wide_df.columns])
+    wide_df.columns.name = "Question"
+    return wide_df
+
+
+def export_long(path, store=STORE_PATH):
+    """Write the store as the long Question,Answer,participant_id CSV"""
+    with closing(open_store(store)) as conn:
+        cursor = conn.execute("SELECT * FROM participants ORDER BY participant_id")
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Question", "Answer", "participant_id"])
+        for row in rows:
+            record = dict(zip(columns, row))
+            for question in columns[len(BOOKKEEPING):]:
+                if record[question] is not None:
+                    writer.writerow([question, record[question], record["participant_id"]])
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest game results into the analysis store")
+    parser.add_argument("sources", nargs="*", help="results files, default: the game's session files")
+    parser.add_argument("--store", default=str(STORE_PATH), help="SQLite file of the store")
+    parser.add_argument("--rebuild", action="store_true", help="ingest every file again from scratch")
+    parser.add_argument("--export", metavar="CSV", help="also write the long-format merged CSV")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.store):
+        os.remove(args.store)
+    files, participants = ingest(args.sources or None, args.store)
+    print(f"Ingested {files} files, {participants} participants into {args.store}")
+    if args.export:
+        print(f"Wrote {export_long(args.export, args.store)} participants to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Bootstrap and permutation statistics for comparing two groups of participants.
+
+compare_groups() gives the difference in means of a metric between two
+groups with a percentile bootstrap confidence interval, a two-sided
+permutation p-value and Cohen's d / Hedges' g. compare_all() does so for
+several metrics of the participant table, e.g. every composite by
+study_type.
+
+Resamples are drawn as whole arrays, CHUNK_SIZE at a time, so memory stays
+bounded whatever the number of resamples. Every chunk has its own random
+stream derived from the seed, the metric and the chunk number, so results
+depend only on the seed and can be computed by several processes at once
+(workers > 1) without changing them.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+N_RESAMPLES = 100_000
+CHUNK_SIZE = 10_000
+SEED = 0
+
+
+def _chunk_sizes(n_resamples, chunk_size):
+    full, rest = divmod(n_resamples, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+def _resample_chunk(a, b, size, seed, metric, chunk):
+    """Bootstrap mean differences and permutation mean differences of one chunk"""
+    rng = np.random.default_rng(np.random.SeedSequence([seed, metric, chunk]))
+    # Bootstrap each group separately, one row per resample
+    boot = (a[rng.integers(0, len(a), size=(size, len(a)))].mean(axis=1)
+            - b[rng.integers(0, len(b), size=(size, len(b)))].mean(axis=1))
+    # Shuffle the pooled values of every row and split them back into groups
+    shuffled = rng.permuted(np.broadcast_to(np.concatenate([a, b]), (size, len(a) + len(b))), axis=1)
+    perm = shuffled[:, :len(a)].mean(axis=1) - shuffled[:, len(a):].mean(axis=1)
+    return boot, perm
+
+
+def effect_sizes(a, b):
+    """Cohen's d with the pooled standard deviation, and Hedges' g
+
+    Returns:
+        tuple: (d, g), NaN when the groups are too small or constant
+    """
+    n_a, n_b = len(a), len(b)
+    if n_a < 2 or n_b < 2:
+        return np.nan, np.nan
+    pooled = np.sqrt(((n_a - 1) * a.var(ddof=1) + (n_b - 1) * b.var(ddof=1)) / (n_a + n_b - 2))
+    if pooled == 0:
+        return np.nan, np.nan
+    d = (a.mean() - b.mean()) / pooled
+    return d, d * (1 - 3 / (4 * (n_a + n_b) - 9))
+
+
+def compare_groups(a, b, n_resamples=N_RESAMPLES, seed=SEED, ci=0.95, chunk_size=CHUNK_SIZE,
+                   workers=1, metric=0):
+    """Compare the mean of a metric between two groups
+
+    Missing values are left out.
+
+    Args:
+        a (array-like): Values of the first group
+        b (array-like): Values of the second group
+        n_resamples (int): Bootstrap and permutation resamples
+        seed (int): Seed of the random streams
+        ci (float): Coverage of the confidence interval
+        chunk_size (int): Resamples drawn at once
+        workers (int): Processes sharing the chunks, 1 to stay in this process
+        metric (int): Number of the metric, gives each metric its own streams
+
+    Returns:
+        dict: n_a, n_b, mean_a, mean_b, diff (mean_a - mean_b), ci_low,
+            ci_high, p_value, cohens_d and hedges_g
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    result = {"n_a": len(a), "n_b": len(b), "mean_a": a.mean() if len(a) else np.nan,
+              "mean_b": b.mean() if len(b) else np.nan}
+    result["diff"] = result["mean_a"] - result["mean_b"]
+    result["cohens_d"], result["hedges_g"] = effect_sizes(a, b)
+    if not len(a) or not len(b):
+        result.update(ci_low=np.nan, ci_high=np.nan, p_value=np.nan)
+        return result
+
+    sizes = _chunk_sizes(n_resamples, chunk_size)
+    args = [(a, b, size, seed, metric, chunk) for chunk, size in enumerate(sizes)]
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            chunks = list(pool.map(_resample_chunk, *zip(*args)))
+    else:
+        chunks = [_resample_chunk(*arg) for arg in args]
+    boot = np.concatenate([c[0] for c in chunks])
+    perm = np.concatenate([c[1] for c in chunks])
+
+    alpha = (1 - ci) / 2
+    result["ci_low"], result["ci_high"] = np.quantile(boot, [alpha, 1 - alpha])
+    # Small tolerance so permutations equal to the observed difference count as extreme
+    extreme = np.count_nonzero(np.abs(perm) >= abs(result["diff"]) - 1e-12)
+    result["p_value"] = (extreme + 1) / (len(perm) + 1)
+    return result
+
+
+def compare_all(wide_df, group_col, metrics, groups=None, **kwargs):
+    """Compare several metrics between two groups of the participant table
+
+    Args:
+        wide_df (pandas.DataFrame): Participant table with its metrics
+        group_col (str): Column holding the group of each participant
+        metrics (list): Columns to compare
+        groups (tuple): The two groups (a, b), by default the first two categories
+        **kwargs: Passed on to compare_groups()
+
+    Returns:
+        pandas.DataFrame: One row per metric, columns as compare_groups() and group_a, group_b
+    """
+    if groups is None:
+        column = wide_df[group_col]
+        values = column.cat.categories if hasattr(column, "cat") else sorted(column.dropna().unique())
+        groups = tuple(values[:2])
+    rows = []
+    for number, metric in enumerate(metrics):
+        values = pd.to_numeric(wide_df[metric], errors="coerce")
+        row = compare_groups(values[wide_df[group_col] == groups[0]], values[wide_df[group_col] == groups[1]],
+                             metric=number, **kwargs)
+        rows.append(dict(metric=metric, group_a=groups[0], group_b=groups[1], **row))
+    return pd.DataFrame(rows).set_index("metric")
+
+
+def format_result(row):
+    """Short summary of a compare_all() row for figure titles"""
+    return f"Δ = {row['diff']:.2f} [{row['ci_low']:.2f}, {row['ci_high']:.2f}], p = {row['p_value']:.3f}, g = {row['hedges_g']:.2f}"
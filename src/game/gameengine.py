@@ -0,0 +1,249 @@
+"""
+Rules of the pandemic game, without Ren'Py.
+
+script.rpy applies each choice with apply_choice(), and GameState plays a
+single participant the same way outside the game. simulate() plays any
+number of simulated participants at once: every turn is a handful of array
+operations over all of them, so millions of playthroughs take seconds. How
+the simulated players choose is up to a policy, a function of the turn and
+the batch returning each player's chance of taking the riskier option, e.g.
+nudged_policy(), where the RISK robot's reactions make later choices riskier.
+to_rows() and write_results() turn a batch into the Question,Answer,
+participant_id rows of hri-results.csv, with synthetic questionnaire
+answers, to load-test the analysis and the results store.
+
+Only the simulation needs numpy, which is imported when it runs, so the
+game can import this module as it is.
+"""
+
+import random
+
+STATS = ("health", "economy", "public_order")
+START_STATS = {"health": 100, "economy": 100, "public_order": 100}
+
+# Options of each turn, (less risky, more risky), and the stat changes of each option
+TURN_OPTIONS = {
+    1: ("lockdown", "monitor"),
+    2: ("health", "order"),
+    3: ("vaccine", "lie"),
+    4: ("emergency", "disinformation"),
+    5: ("equity", "unequal"),
+}
+TURN_EFFECTS = {
+    1: {"lockdown": {"public_order": -25, "economy": -25},
+        "monitor": {"health": -25, "public_order": -25}},
+    2: {"health": {"economy": -25},
+        "order": {"economy": -25}},
+    3: {"vaccine": {"public_order": -25, "economy": -50},
+        "lie": {"public_order": -25, "economy": -25}},
+    4: {"emergency": {"health": -25, "public_order": -25},
+        "disinformation": {"health": -50}},
+    5: {"equity": {"economy": -25},
+        "unequal": {"health": -25}},
+}
+TURNS = len(TURN_OPTIONS)
+
+# Share of participants assigned to the RISK robot, as assign_study_type() rolls it
+RISK_SHARE = 0.495
+
+# Stat total a player needs for NAO to stand down without the LLM, with every
+# stat above WIN_MIN. The five turns cost 200 to 225 of the 300 starting points, so
+# this is the best reachable total.
+WIN_TOTAL = 100
+WIN_MIN = 0
+
+# Questionnaires of the results file, in the order the game asks them
+RISK_ITEMS = [f"risk_q{i}" for i in range(1, 8)]
+GODSPEED_ITEMS = ([f"anthropomorphism_{i}" for i in range(1, 6)] + [f"animacy_{i}" for i in range(1, 7)]
+                  + [f"likeability_{i}" for i in range(1, 6)] + [f"influence_{i}" for i in range(1, 5)])
+RISK_SCALE = 9  # risk_q answers run from 1 to RISK_SCALE
+GODSPEED_SCALE = 5
+GENDERS = ("male", "female")
+
+
+def assign_study_type(rng=random):
+    """Roll the robot condition of a new participant"""
+    roll = round(rng.random(), 2)
+    return "RISK" if roll > 0.50 else "CONTROL"
+
+
+def rule_outcome(health, economy, public_order):
+    """Ending decided from the stats alone, "win" or "bad" """
+    if health + economy + public_order >= WIN_TOTAL and min(health, economy, public_order) > WIN_MIN:
+        return "win"
+    return "bad"
+
+
+def apply_choice(stats, turn, choice):
+    """Stats after the choice of a turn
+
+    Args:
+        stats (dict): Stats before the choice
+        turn (int): Turn number
+        choice (str): Chosen option
+
+    Returns:
+        dict: New stats, stats itself is left as it was
+    """
+    if choice not in TURN_EFFECTS.get(turn, {}):
+        raise ValueError(f"Turn {turn} has no option {choice!r}")
+    stats = dict(stats)
+    for stat, delta in TURN_EFFECTS[turn][choice].items():
+        stats[stat] += delta
+    return stats
+
+
+class GameState:
+    def __init__(self, study_type=None, rng=random):
+        """State of one playthrough
+
+        Args:
+            study_type (str): "RISK" or "CONTROL", rolled when None
+            rng (random.Random): Source of the study type roll
+        """
+        self.study_type = study_type or assign_study_type(rng)
+        self.stats = dict(START_STATS)
+        self.turn = 1
+        self.choices = {}  # Turn -> chosen option
+
+    def apply(self, turn, choice):
+        """Apply the choice of a turn to the stats
+
+        Returns:
+            dict: Stat changes of the choice
+        """
+        self.stats = apply_choice(self.stats, turn, choice)
+        self.choices[turn] = choice
+        self.turn = turn + 1
+        return dict(TURN_EFFECTS[turn][choice])
+
+    def outcome(self, response=""):
+        """Ending without the LLM: silence always loses, otherwise rule_outcome()"""
+        if not response.strip():
+            return "bad"
+        return rule_outcome(**self.stats)
+
+
+class Playthroughs:
+    def __init__(self, n, rng):
+        """Arrays of a batch of simulated participants, filled in by simulate()
+
+        Args:
+            n (int): Participants in the batch
+            rng (numpy.random.Generator): Source of every random draw
+        """
+        import numpy as np
+
+        self.n = n
+        self.risk = rng.random(n) < RISK_SHARE  # True for the RISK robot
+        self.stats = np.tile(np.array([START_STATS[s] for s in STATS], dtype=np.int16), (n, 1))
+        self.choices = np.full((n, TURNS), -1, dtype=np.int8)  # 0 less risky, 1 more risky
+        # Questionnaires are answered before the game, so policies may use them
+        self.risk_answers = rng.integers(1, RISK_SCALE + 1, size=(n, len(RISK_ITEMS)), dtype=np.int8)
+        self.rps = self.risk_answers.mean(axis=1)
+        self.godspeed_answers = rng.integers(1, GODSPEED_SCALE + 1, size=(n, len(GODSPEED_ITEMS)), dtype=np.int8)
+        self.female = rng.random(n) < 0.5  # Index into GENDERS
+        self.outcome = None  # True where NAO stands down
+
+
+def random_policy(turn, batch, rng):
+    """Every option equally likely"""
+    return 0.5
+
+
+def nudged_policy(base=0.3, nudge=0.2, propensity=0.4):
+    """Policy of players whose choices follow their risk propensity and the robot
+
+    Args:
+        base (float): Chance of the riskier option for an average player
+        nudge (float): Added from turn 2 on for players with the RISK robot,
+            whose reactions to earlier choices push towards risk
+        propensity (float): Added per unit of RPS above the scale's midpoint,
+            scaled to the RPS range
+
+    Returns:
+        callable: The policy
+    """
+    def policy(turn, batch, rng):
+        import numpy as np
+        p = base + propensity * ((batch.rps - 1) / (RISK_SCALE - 1) - 0.5)
+        if turn > 1:
+            p = p + nudge * batch.risk
+        return np.clip(p, 0.0, 1.0)
+    return policy
+
+
+POLICIES = {
+    "random": random_policy,
+    "nudged": nudged_policy(),
+}
+
+
+def simulate(n, policy=random_policy, seed=0):
+    """Play n simulated participants through the game at once
+
+    Args:
+        n (int): Participants
+        policy (callable): policy(turn, batch, rng) giving each player's
+            chance of the riskier option, a number or an array of n
+        seed (int): Seed of every random draw
+
+    Returns:
+        Playthroughs: The batch with its choices, final stats and outcomes
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    batch = Playthroughs(n, rng)
+    for turn, options in TURN_OPTIONS.items():
+        # Stat changes of (less risky, more risky), one row each
+        deltas = np.array([[TURN_EFFECTS[turn][option].get(s, 0) for s in STATS] for option in options],
+                          dtype=np.int16)
+        risky = rng.random(n) < policy(turn, batch, rng)
+        batch.choices[:, turn - 1] = risky
+        batch.stats += deltas[risky.astype(np.intp)]
+    stats = batch.stats
+    batch.outcome = (stats.sum(axis=1) >= WIN_TOTAL) & (stats.min(axis=1) > WIN_MIN)
+    return batch
+
+
+def to_wide(batch, start_id=1):
+    """The batch as the participant x question table of hri_results.load_wide()
+
+    Returns:
+        pandas.DataFrame: Indexed by participant_id, one column per question
+    """
+    import numpy as np
+    import pandas as pd
+
+    columns = {"study_type": np.where(batch.risk, "RISK", "CONTROL"),
+               "participant_gender": np.array(GENDERS)[batch.female.astype(np.intp)]}
+    columns.update(zip(RISK_ITEMS, batch.risk_answers.T))
+    for turn, options in TURN_OPTIONS.items():
+        columns[f"turn_{turn}"] = np.array(options)[batch.choices[:, turn - 1]]
+    columns["player_response"] = np.where(batch.outcome, "I did what the people needed.", "I had no choice.")
+    columns["verdict_source"] = "fallback"
+    columns.update(zip(GODSPEED_ITEMS, batch.godspeed_answers.T))
+    columns["feedback_1"] = columns["feedback_2"] = "simulated"
+    wide_df = pd.DataFrame(columns, index=pd.RangeIndex(start_id, start_id + batch.n, name="participant_id"))
+    wide_df.columns.name = "Question"
+    return wide_df
+
+
+def to_rows(batch, start_id=1):
+    """The batch as the long Question,Answer,participant_id rows of hri-results.csv
+
+    Returns:
+        pandas.DataFrame: Rows ordered by participant, questions in game order
+    """
+    wide_df = to_wide(batch, start_id)
+    long_df = wide_df.astype(str).reset_index().melt(id_vars="participant_id", var_name="Question",
+                                                     value_name="Answer")
+    # Stable sort keeps the game's question order within each participant
+    long_df = long_df.sort_values("participant_id", kind="stable")
+    return long_df[["Question", "Answer", "participant_id"]]
+
+
+def write_results(path, batch, start_id=1):
+    """Write the batch as a long-format results CSV like hri-results.csv"""
+    to_rows(batch, start_id).to_csv(path, index=False)
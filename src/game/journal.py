@@ -0,0 +1,278 @@
+"""
+Crash-safe journal of a play session.
+
+Every answer, turn decision and robot command is appended to
+saves/journal_<timestamp>.jsonl as one JSON line the moment it happens, so a
+crash or a closed window loses at most the last FSYNC_INTERVAL seconds of
+the session instead of all of it. Writing happens on a background thread:
+record() only puts the event on a queue, and the writer flushes lines in
+batches and syncs the file to disk at most once per FSYNC_INTERVAL.
+
+When the session reaches the end screen, the journal is consolidated into
+the usual results_<timestamp>.csv of Question,Answer rows, with the time
+taken for each decision added. A session that is abandoned, e.g. by
+starting a new game, gets no results file, so only finished sessions reach
+the analysis. consolidate() rebuilds the file from a journal, see
+tools/consolidate_journal.py; sessions that never finished are written to
+partial_<timestamp>.csv, which hri_results leaves out.
+
+The session lives in this module rather than the Ren'Py store, so it is
+never saved with the game.
+"""
+
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+import robotmetrics
+
+log = robotmetrics.get_logger("journal")
+
+# Seconds between syncs of the journal to disk
+FSYNC_INTERVAL = 1.0
+
+# Seconds the writer waits for more events before it flushes what it has
+FLUSH_INTERVAL = 0.2
+
+_CLOSE = object()
+
+
+class SessionJournal:
+    def __init__(self, folder, timestamp):
+        """Open the journal of a new session and start its writer thread
+
+        Args:
+            folder (str): Directory of the journal and the results file
+            timestamp (str): Session timestamp used in both file names
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.timestamp = timestamp
+        self.path = os.path.join(folder, f"journal_{timestamp}.jsonl")
+        self.answers = {}  # Question -> answer, in the order first given
+        self.decision_started = {}  # Turn -> (time.monotonic(), stats) when its menu was shown
+        self.events = queue.Queue()
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.writer = threading.Thread(target=self._write_loop, name="session-journal", daemon=True)
+        self.writer.start()
+
+    def record(self, event, **fields):
+        """Append an event to the journal without waiting for the disk"""
+        fields["event"] = event
+        fields["t"] = round(time.time(), 3)
+        self.events.put(fields)
+
+    def answer(self, key, value):
+        """Record the answer to a question of the results file"""
+        self.answers[key] = value
+        self.record("answer", key=key, value=value)
+
+    def open_decision(self, turn, stats):
+        """Start timing the decision of a turn, called when its menu is shown"""
+        self.decision_started[turn] = (time.monotonic(), dict(stats))
+        self.record("menu", turn=turn, stats=stats)
+
+    def record_turn(self, turn, choice, stats):
+        """Record the choice of a turn with its decision time and stat changes
+
+        Args:
+            turn (int): Turn number
+            choice (str): Chosen option
+            stats (dict): Stats after the choice
+
+        Returns:
+            float: Milliseconds taken to decide, None if the menu was not timed
+        """
+        started, before = self.decision_started.pop(turn, (None, None))
+        decision_ms = round((time.monotonic() - started) * 1000, 1) if started is not None else None
+        deltas = {name: value - before[name] for name, value in stats.items() if name in before} if before else {}
+        self.answers[f"turn_{turn}"] = choice
+        if decision_ms is not None:
+            self.answers[f"turn_{turn}_decision_ms"] = decision_ms
+        self.record("turn", turn=turn, choice=choice, decision_ms=decision_ms, deltas=deltas, stats=stats)
+        return decision_ms
+
+    def close(self, complete=True):
+        """Write the remaining events, sync the journal and stop the writer
+
+        Args:
+            complete (bool): True when the session reached the end screen,
+                False when it is abandoned
+
+        Returns:
+            str: Path of the consolidated results file, None for an
+                abandoned session, which gets no results file
+        """
+        self.record("end", complete=complete)
+        self.events.put(_CLOSE)
+        self.writer.join()
+        if not complete:
+            return None
+        results_path = results_file(self.path)
+        write_results(results_path, self.answers)
+        return results_path
+
+    def _write_loop(self):
+        last_sync = time.monotonic()
+        closing = False
+        while not closing:
+            try:
+                item = self.events.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                item = None
+            # Take everything queued so far and write it in one go
+            batch = []
+            while item is not None:
+                if item is _CLOSE:
+                    closing = True
+                    break
+                batch.append(json.dumps(item, default=str))
+                try:
+                    item = self.events.get_nowait()
+                except queue.Empty:
+                    item = None
+            try:
+                if batch:
+                    self.file.write("\n".join(batch) + "\n")
+                    self.file.flush()
+                if closing or (batch and time.monotonic() - last_sync >= FSYNC_INTERVAL):
+                    os.fsync(self.file.fileno())
+                    last_sync = time.monotonic()
+            except OSError as e:
+                log.error("Could not write session journal %s: %s", self.path, e)
+        self.file.close()
+
+
+def write_results(path, answers):
+    """Write answers as the Question,Answer CSV read by the analysis scripts"""
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Question", "Answer"])
+        for key, value in answers.items():
+            writer.writerow([key, value])
+
+
+def read_journal(journal_path):
+    """Rebuild the answers of a session from its journal
+
+    A torn last line, left by a crash in the middle of a write, is skipped.
+    When a question was answered twice, e.g. after a rollback, the last
+    answer counts.
+
+    Returns:
+        tuple: (answers, complete), answers a dict of question -> answer in
+            the order first given, complete True if the session reached the
+            end screen
+    """
+    answers = {}
+    complete = False
+    with open(journal_path, encoding="utf-8") as journal_file:
+        for line in journal_file:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if event.get("event") == "answer":
+                answers[event["key"]] = event["value"]
+            elif event.get("event") == "turn":
+                answers[f"turn_{event['turn']}"] = event["choice"]
+                if event.get("decision_ms") is not None:
+                    answers[f"turn_{event['turn']}_decision_ms"] = event["decision_ms"]
+            elif event.get("event") == "end":
+                # Journals written before sessions were marked complete end the same way
+                complete = event.get("complete", True)
+    return answers, complete
+
+
+def read_answers(journal_path):
+    """Answers of a session rebuilt from its journal, see read_journal()"""
+    return read_journal(journal_path)[0]
+
+
+def results_file(journal_path, complete=True):
+    """Results file of a journal: results_<timestamp>.csv next to it, partial_<timestamp>.csv if unfinished"""
+    folder, name = os.path.split(journal_path)
+    timestamp = name[len("journal_"):].rsplit(".", 1)[0]
+    return os.path.join(folder, f"{'results' if complete else 'partial'}_{timestamp}.csv")
+
+
+def consolidate(journal_path, path=None):
+    """Write the results file of a session from its journal
+
+    Args:
+        journal_path (str): Path of a journal_<timestamp>.jsonl file
+        path (str): Path of the results file, by default results_file()
+
+    Returns:
+        tuple: (path of the results file, answers written to it)
+    """
+    answers, complete = read_journal(journal_path)
+    if path is None:
+        path = results_file(journal_path, complete)
+    write_results(path, answers)
+    return path, answers
+
+
+# Journal of the session being played, None between sessions
+session = None
+
+
+def start_session(folder, timestamp):
+    """Start the journal of a new session, abandoning one left open"""
+    global session
+    if session is not None:
+        session.close(complete=False)
+    session = SessionJournal(folder, timestamp)
+    log.info("Session journal: %s", session.path)
+    return session
+
+
+def end_session():
+    """End the journal of a session that reached the end screen
+
+    Returns:
+        str: Path of the consolidated results file, None without a session
+    """
+    global session
+    if session is None:
+        return None
+    results_path = session.close()
+    session = None
+    return results_path
+
+
+def record(event, **fields):
+    """Append an event to the session journal, if a session is running"""
+    if session is not None:
+        session.record(event, **fields)
+
+
+def answer(key, value):
+    """Journal the answer to a question, if a session is running"""
+    if session is not None:
+        session.answer(key, value)
+
+
+def open_decision(turn, stats):
+    """Start timing the decision of a turn, if a session is running"""
+    if session is not None:
+        session.open_decision(turn, stats)
+
+
+def record_turn(turn, choice, stats):
+    """Journal the choice of a turn, if a session is running
+
+    Returns:
+        float: Milliseconds taken to decide, None if not timed
+    """
+    if session is None:
+        return None
+    return session.record_turn(turn, choice, stats)
+
+
+def robot_event(event, fields):
+    """Listener for robotcontrol.set_event_listener(), journals robot commands"""
+    record(event, **fields)
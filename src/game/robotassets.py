@@ -0,0 +1,143 @@
+"""
+Content-addressed audio assets for the robot link.
+
+The game keeps the master copy of the robot's audio clips in nao/audio_files/.
+When a robot identifies itself, the server sends it an index of those files
+with their SHA-256 digests; the robot compares it with its own cache and asks
+for the files it lacks or holds in a different version, which are streamed in
+chunks over the robot connection. Files the robot already has are never sent
+again, so re-deploying a station only costs a handful of hashes.
+
+Chunk payloads are binary: a JSON header line followed by the chunk bytes,
+zlib compressed when the header says so.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+
+import robotmetrics
+
+log = robotmetrics.get_logger("assets")
+
+# Directory holding the master copy of the robot audio files
+AUDIO_DIRECTORY = os.environ.get(
+    "NAO_AUDIO_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "nao", "audio_files"))
+
+# Bytes of file data per chunk frame, small enough for heartbeats to get through in between
+CHUNK_SIZE = 64 * 1024
+
+# Extensions of the files that are synced
+ASSET_EXTENSIONS = (".wav",)
+
+
+def file_digest(file_path):
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as asset:
+        for block in iter(lambda: asset.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def encode_chunk(name, offset, data, compress=False):
+    """Build the payload of a chunk frame
+
+    Args:
+        name (str): File name of the asset
+        offset (int): Position of the chunk in the uncompressed file
+        data (bytes): Chunk bytes
+        compress (bool): zlib compress the bytes
+
+    Returns:
+        bytes: JSON header line followed by the (compressed) bytes
+    """
+    if compress:
+        packed = zlib.compress(data)
+        # Audio rarely shrinks, so only use the compressed bytes when they help
+        if len(packed) < len(data):
+            header = {"name": name, "offset": offset, "length": len(data), "z": 1}
+            return json.dumps(header).encode('utf-8') + b"\n" + packed
+    header = {"name": name, "offset": offset, "length": len(data)}
+    return json.dumps(header).encode('utf-8') + b"\n" + data
+
+
+def decode_chunk(payload):
+    """Split a chunk payload into its header and uncompressed bytes"""
+    line, _, data = payload.partition(b"\n")
+    header = json.loads(line.decode('utf-8'))
+    if header.get("z"):
+        data = zlib.decompress(data)
+    return header, data
+
+
+class AssetIndex:
+    def __init__(self, directory=AUDIO_DIRECTORY, compress=False):
+        """Digests of the audio files the robots should hold
+
+        Digests are cached by file size and modification time, so the index
+        can be refreshed on every robot connection without hashing again.
+
+        Args:
+            directory (str): Directory holding the master copy of the files
+            compress (bool): zlib compress chunks sent to the robots
+        """
+        self.directory = directory
+        self.compress = compress
+        self._digests = {}  # File name -> (size, mtime, digest)
+
+    def refresh(self):
+        """Rescan the directory
+
+        Returns:
+            dict: File name -> {"sha256": digest, "size": bytes}
+        """
+        index = {}
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError as e:
+            log.warning("Cannot read audio directory %s: %s", self.directory, e)
+            names = []
+        for name in names:
+            if not name.lower().endswith(ASSET_EXTENSIONS):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            cached = self._digests.get(name)
+            if cached is None or cached[:2] != (stat.st_size, stat.st_mtime):
+                cached = (stat.st_size, stat.st_mtime, file_digest(os.path.join(self.directory, name)))
+                self._digests[name] = cached
+            index[name] = {"sha256": cached[2], "size": cached[0]}
+        return index
+
+    def missing(self, names):
+        """Return the names that are not in the asset directory"""
+        return sorted(name for name in set(names)
+                      if not os.path.isfile(os.path.join(self.directory, name)))
+
+    def chunks(self, names):
+        """Chunk payloads of the given files, read lazily
+
+        Args:
+            names (list): File names requested by the robot
+
+        Yields:
+            tuple: (file name, chunk payload)
+        """
+        for name in names:
+            name = os.path.basename(name)
+            file_path = os.path.join(self.directory, name)
+            if not os.path.isfile(file_path):
+                continue
+            with open(file_path, 'rb') as asset:
+                offset = 0
+                while True:
+                    data = asset.read(CHUNK_SIZE)
+                    if not data and offset:
+                        break
+                    # Empty files still get one chunk so the robot creates them
+                    yield name, encode_chunk(name, offset, data, self.compress)
+                    offset += len(data)
+                    if not data:
+                        break
@@ -3,41 +3,318 @@ Robot Control Module for NAO/Pepper integration with Renpy
 This module enables communication between the Renpy game and a NAO/Pepper robot via socket connection.
 """
 
+import json
+import selectors
 import socket
 import threading
 import time
 import os
+import uuid
+from collections import deque, OrderedDict
+
+from robotprotocol import (FrameDecoder, encode_frame, encode_batch, is_framed, BATCH_SEPARATOR,
+                           MSG_HELLO, MSG_COMMAND, MSG_ACK, MSG_STATUS,
+                           MSG_PING, MSG_PONG, MSG_WELCOME, MSG_TRACE,
+                           MSG_MANIFEST, MSG_PRELOADED, MSG_ASSETS, MSG_WANT, MSG_CHUNK, MSG_SYNCED,
+                           MSG_PREPARE, MSG_PREPARED, MSG_RENDER, MSG_RENDERED)
+from robotassets import AssetIndex
+from robottrace import LatencyTracer
+import robotmetrics
+from robotmetrics import LatencyWindow, link_health, start_metrics_server
+
+log = robotmetrics.get_logger()
+
+# Station used by robots that do not send a station ID in their ready message
+DEFAULT_STATION = "default"
+
+# A robot reaction older than this is dropped instead of being delivered late
+REACTION_TTL = 5.0
+
+# Seconds the game waits at the start for the robot to load the audio files
+PRELOAD_TIMEOUT = 5.0
+
+# Gesture shown while the final verdict is decided
+THINKING_GESTURE = "gesture:thinking"
+
+# Line spoken for a reaction with neither an audio file nor a message
+DEFAULT_SPEECH = "I'm processing turn {turn} information."
+
+class QueuedBatch:
+    def __init__(self, commands, deadline=None, replace_key=None, trace=None):
+        """Commands waiting in a station's outbound queue
+        
+        Args:
+            commands (list): Commands to send together
+            deadline (float): time.monotonic() value after which the batch is
+                dropped, or None to keep it until it is sent
+            replace_key (str): A newer batch with the same key replaces this one
+                if it has not been written yet
+            trace (dict): Latency trace of the batch when tracing is enabled
+        """
+        self.commands = commands
+        self.deadline = deadline
+        self.replace_key = replace_key
+        self.trace = trace
+        self.seq = None  # Assigned when the batch is first encoded
+        self.frame = None  # Encoded frame, kept so a replay resends the same bytes
+        self.sent_at = None  # time.monotonic() when the batch was first written
+    
+    def expired(self, now):
+        """True if the deadline of the batch has passed"""
+        return self.deadline is not None and self.deadline < now
+
+class StationState:
+    def __init__(self, station_id, replay_size):
+        """State of a station that outlives individual robot connections
+        
+        Sequence numbers, queued commands, unacknowledged frames and counters
+        are kept here so that a robot reconnecting with the same station ID
+        continues where the previous connection stopped.
+        
+        Args:
+            station_id (str): The station ID sent by the robot
+            replay_size (int): Unacknowledged frames kept for replay
+        """
+        self.station_id = station_id
+        self.replay_size = replay_size
+        self.next_seq = 1
+        self.unacked = OrderedDict()  # Sequence number -> QueuedBatch still waiting for an ack
+        self.outbound = deque()  # QueuedBatch objects waiting to be written by the server loop
+        self.last_heartbeat = None  # time.monotonic() of the last pong
+        self.manifest_seq = 0  # Number of the last audio manifest sent to the robot
+        self.preload_done = False  # True once the robot answered that manifest
+        self.preload_result = None  # {"loaded": [...], "missing": [...]} reported by the robot
+        self.sync_seq = 0  # Number of the last asset index sent to the robot
+        self.sync_done = False  # True once the robot holds every file of that index
+        self.sync_result = None  # {"synced": [...], "failed": [...]} reported by the robot
+        self.prepare_seq = 0  # Number of the last set of candidate reactions sent to the robot
+        self.candidates = {}  # Key -> commands of those candidates
+        self.staged = False  # True once the robot has staged them
+        self.render_seq = 0  # Number of the last list of speech texts sent to the robot
+        self.render_done = False  # True once the robot has rendered them
+        self.render_result = None  # {"rendered": n, "cached": n, "failed": [...]} reported by the robot
+        self.stats = {
+            "queued": 0,  # Batches accepted by send_batch()
+            "sent": 0,  # Batches handed to the socket
+            "acked": 0,  # Frames acknowledged by the robot
+            "expired": 0,  # Batches dropped because their deadline passed
+            "replaced": 0,  # Batches superseded by a newer one with the same key
+            "overflow": 0,  # Batches dropped because the queue was full
+            "stalls": 0,  # Writes the socket could only partly accept
+            "max_depth": 0,  # Largest number of batches queued at once
+            "replayed": 0,  # Unacknowledged frames resent after a reconnect
+            "connects": 0,  # Times a robot identified itself for this station
+            "heartbeat_timeouts": 0,  # Connections closed because the robot went silent
+            "asset_chunks": 0,  # Asset chunk frames sent during syncs
+            "asset_bytes": 0,  # Payload bytes of those chunks
+            "commits": 0,  # Reactions sent as a commit of a staged candidate
+            "commit_misses": 0,  # Reactions sent in full because no candidate was staged
+            "bytes_sent": 0,  # Bytes written to the robot's socket
+            "bytes_received": 0,  # Bytes read from the robot's socket
+        }
+        self.rtt = LatencyWindow()  # Heartbeat round trips, ping to pong
+        self.ack_latency = LatencyWindow()  # Command batches, written to acknowledged
+    
+    def next_sequence(self):
+        """Return the next frame sequence number"""
+        seq = self.next_seq
+        self.next_seq = (self.next_seq + 1) & 0xFFFFFFFF or 1
+        return seq
+    
+    def enqueue(self, batch, max_queue):
+        """Add a batch to the outbound queue, applying replacement and overflow rules"""
+        if batch.replace_key is not None:
+            for queued in list(self.outbound):
+                if queued.replace_key == batch.replace_key:
+                    self.outbound.remove(queued)
+                    self.stats["replaced"] += 1
+        while len(self.outbound) >= max_queue:
+            self.outbound.popleft()
+            self.stats["overflow"] += 1
+        self.outbound.append(batch)
+        self.stats["queued"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self.outbound))
+    
+    def next_batch(self):
+        """Pop the next batch whose deadline has not passed, or None"""
+        now = time.monotonic()
+        while self.outbound:
+            batch = self.outbound.popleft()
+            if not batch.expired(now):
+                return batch
+            self.stats["expired"] += 1
+            log.warning("Dropped stale commands for robot %s: %s", self.station_id, batch.commands)
+        return None
+    
+    def encode(self, batch, framed):
+        """Encode a batch for this station's robot
+        
+        Framed batches get a sequence number and are remembered until the
+        robot acknowledges them, so they can be replayed after a reconnect.
+        Plain-text robots read each write as one command, so their batches
+        are written one command at a time.
+        
+        Returns:
+            list: Byte strings to write one after the other
+        """
+        if not framed:
+            return [command.encode('utf-8') for command in batch.commands]
+        
+        batch.seq = self.next_sequence()
+        if len(batch.commands) == 1:
+            batch.frame = encode_frame(MSG_COMMAND, batch.seq, batch.commands[0])
+        else:
+            batch.frame = encode_batch(batch.seq, batch.commands)
+        self.unacked[batch.seq] = batch
+        while len(self.unacked) > self.replay_size:
+            self.unacked.popitem(last=False)
+        log.debug("Sending frame %s to robot %s: %s", batch.seq, self.station_id, batch.commands)
+        return [batch.frame]
+    
+    def replay_frames(self):
+        """Return the encoded unacknowledged frames that are still worth resending"""
+        now = time.monotonic()
+        frames = []
+        for seq, batch in list(self.unacked.items()):
+            if batch.expired(now):
+                del self.unacked[seq]
+                self.stats["expired"] += 1
+            else:
+                frames.append(batch.frame)
+        self.stats["replayed"] += len(frames)
+        return frames
+
+class RobotSession:
+    def __init__(self, sock, address):
+        """State of one robot connection
+        
+        Args:
+            sock (socket.socket): The non-blocking robot connection
+            address (tuple): The robot address as returned by accept()
+        """
+        self.sock = sock
+        self.address = address
+        self.station = None  # StationState, set by the robot's ready message
+        self.framed = False  # True once the robot has identified itself with a frame
+        self.decoder = FrameDecoder()
+        self.write_buffer = bytearray()  # Encoded bytes not yet accepted by the socket
+        self.pending_writes = deque()  # Plain-text commands waiting for the previous one to be written
+        self.last_seen = time.monotonic()  # Last time any data arrived from the robot
+        self.next_ping = 0.0  # time.monotonic() at which the next heartbeat is due
+        self.ping_seq = 0
+        self.ping_sent_at = None  # time.monotonic() of the last ping, for its round trip
+        self.writing_seq = None  # Traced frame currently in the write buffer
+        self.asset_chunks = None  # Iterator over the chunks of the files being synced
+    
+    @property
+    def ready(self):
+        """True once the robot has sent its ready message"""
+        return self.station is not None
+    
+    @property
+    def station_id(self):
+        """Station ID of the robot, None until it has identified itself"""
+        return self.station.station_id if self.station else None
+
+
+def parse_ready_message(text):
+    """Extract the station ID from a robot ready message
+    
+    Args:
+        text (str): "robot_ready" or "robot_ready:<station_id>"
+    
+    Returns:
+        str: The station ID, or None if the text is not a ready message
+    """
+    name, _, station_id = text.strip().partition(":")
+    if name != "robot_ready":
+        return None
+    return station_id.strip() or DEFAULT_STATION
+
 
 class RobotServer:
-    def __init__(self, host='0.0.0.0', port=8888):
+    def __init__(self, host='0.0.0.0', port=8888, backlog=16, max_queue=32,
+                 heartbeat_interval=0.25, heartbeat_timeout=0.75, replay_size=16,
+                 tracer=None, assets=None, listener=None, metrics_port=None):
         """Initialize the robot control server
         
         Args:
             host (str): The IP address to bind the server to
-            port (int): The port to listen on
+            port (int): The port to listen on, 0 to let the OS pick a free one
+            backlog (int): Number of pending robot connections the OS may queue
+            max_queue (int): Batches each robot may have queued before the
+                oldest ones are dropped
+            heartbeat_interval (float): Seconds between pings to framed robots
+            heartbeat_timeout (float): Seconds of silence after which a framed
+                robot is considered dead and its connection is closed
+            replay_size (int): Unacknowledged frames kept per station and
+                resent when its robot reconnects
+            tracer (LatencyTracer): Collects reaction latency traces, None to
+                disable tracing
+            assets (AssetIndex): Audio files synced to every framed robot when
+                it connects, None to leave the robot's files alone
+            listener (callable): Called as listener(event, fields) when a
+                command batch is sent or acknowledged, from the server loop,
+                so it must not block; None to disable
+            metrics_port (int): Local HTTP port serving get_metrics() and the
+                recent log, see robotmetrics; None to disable
         """
         self.host = host
         self.port = port
+        self.backlog = backlog
+        self.max_queue = max_queue
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.replay_size = replay_size
+        self.tracer = tracer
+        self.assets = assets
+        self.listener = listener
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        self.started_at = None  # time.monotonic() of start_server()
+        self.server_id = uuid.uuid4().hex[:12]  # Lets robots tell a restarted server apart
         self.server_socket = None
-        self.client_socket = None
-        self.client_address = None
         self.server_thread = None
         self.running = False
+        self.listening = threading.Event()  # Set once robots can connect
+        self.stations = {}  # Station ID -> StationState of every robot seen so far
+        self.sessions = {}  # Station ID -> RobotSession of connected robots
+        self.connections = {}  # Socket -> RobotSession, including robots still handshaking
+        self.send_lock = threading.Lock()
+        self.reports_changed = threading.Condition(self.send_lock)  # Notified when a robot reports a preload or sync
+        self.manifests = {}  # Station ID -> audio files to preload, None key for every other station
+        self.speech_texts = []  # say: texts every robot renders ahead of time
+        self.selector = None
+        self._wakeup_reader = None
+        self._wakeup_writer = None
         
     def start_server(self):
         """Start the socket server in a separate thread"""
         if self.running:
-            print("Server is already running")
+            log.warning("Server is already running")
             return
             
         self.running = True
+        self.selector = selectors.DefaultSelector()
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._wakeup_reader.setblocking(False)
+        self._wakeup_writer.setblocking(False)
         self.server_thread = threading.Thread(target=self._run_server)
         self.server_thread.daemon = True  # Allow the thread to exit when the main program ends
         self.server_thread.start()
-        print(f"Robot server started on {self.host}:{self.port}")
+        self.started_at = time.monotonic()
+        log.info("Robot server started on %s:%s", self.host, self.port)
+        if self.metrics_port is not None:
+            self.metrics_server = start_metrics_server(self.get_metrics, self.metrics_port)
         
     def _run_server(self):
-        """Internal method to run the server loop"""
+        """Internal method to run the server loop
+        
+        A single thread serves every robot. It sleeps in select() until a
+        socket is readable or writable, another thread wakes it up through the
+        wakeup socket pair, or the next heartbeat is due. With no robot
+        connected it uses no CPU, and robot messages are handled immediately.
+        """
         try:
             # Create socket
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -45,99 +322,704 @@ class RobotServer:
             
             # Bind to address and port
             self.server_socket.bind((self.host, self.port))
+            self.port = self.server_socket.getsockname()[1]
             
             # Listen for connections
-            self.server_socket.listen(1)  # Only allow one connection at a time
-            print("Waiting for robot connection...")
+            self.server_socket.listen(self.backlog)
+            self.server_socket.setblocking(False)
+            self.selector.register(self.server_socket, selectors.EVENT_READ, self._accept_client)
+            self.selector.register(self._wakeup_reader, selectors.EVENT_READ, self._drain_wakeup)
+            self.listening.set()
+            log.info("Waiting for robot connections...")
+            
+            # Hash the audio files now rather than when the first robot connects
+            if self.assets:
+                self.assets.refresh()
             
+            timeout = None
             while self.running:
-                # Accept client connection
-                self.client_socket, self.client_address = self.server_socket.accept()
-                print(f"Robot connected from {self.client_address}")
-                
-                # Set a timeout to avoid blocking forever
-                self.client_socket.settimeout(1.0)
-                
-                # Wait for the initial ready message
-                try:
-                    data = self.client_socket.recv(1024).decode('utf-8')
-                    if data == "robot_ready":
-                        print("Robot is ready to receive commands")
-                    else:
-                        print(f"Unexpected message from robot: {data}")
-                except socket.timeout:
-                    pass
-                except Exception as e:
-                    print(f"Error receiving data: {e}")
-                    self._close_client()
-                    continue
-                
-                # Handle communication in a separate loop
-                while self.running and self.client_socket:
-                    try:
-                        # Check for messages from robot
-                        try:
-                            data = self.client_socket.recv(1024).decode('utf-8')
-                            if data:
-                                print(f"Message from robot: {data}")
-                                
-                                # Handle disconnection message
-                                if data == "disconnecting":
-                                    print("Robot is disconnecting")
-                                    self._close_client()
-                                    break
-                        except socket.timeout:
-                            # Timeout is fine, just continue
-                            pass
-                        
-                        time.sleep(0.1)  # Small sleep to reduce CPU usage
-                        
-                    except Exception as e:
-                        print(f"Error in communication: {e}")
-                        self._close_client()
+                for key, events in self.selector.select(timeout):
+                    if not self.running:
                         break
+                    key.data(key.fileobj, events)
+                timeout = self._check_heartbeats()
         
         except Exception as e:
-            print(f"Server error: {e}")
+            log.error("Server error: %s", e)
         finally:
             self._cleanup()
     
-    def send_command(self, command):
-        """Send a command to the connected robot
+    def _check_heartbeats(self):
+        """Ping framed robots and close the ones that went silent
+        
+        Returns:
+            float: Seconds until the next heartbeat is due, None if no robot needs one
+        """
+        now = time.monotonic()
+        next_due = None
+        for session in list(self.connections.values()):
+            if not (session.ready and session.framed):
+                continue
+            if now - session.last_seen > self.heartbeat_timeout:
+                log.warning("Robot %s missed its heartbeats, closing the connection", session.station_id)
+                session.station.stats["heartbeat_timeouts"] += 1
+                self._close_session(session)
+                continue
+            if now >= session.next_ping:
+                session.ping_seq = (session.ping_seq + 1) & 0xFFFFFFFF
+                # With tracing on, pings carry the send time for the clock offset estimate
+                payload = repr(time.time()) if self.tracer else b""
+                with self.send_lock:
+                    session.write_buffer.extend(encode_frame(MSG_PING, session.ping_seq, payload))
+                session.ping_sent_at = now
+                session.next_ping = now + self.heartbeat_interval
+                self._update_interest(session)
+            due = min(session.next_ping, session.last_seen + self.heartbeat_timeout) - now
+            next_due = due if next_due is None else min(next_due, due)
+        return None if next_due is None else max(next_due, 0.0)
+    
+    def _wakeup(self):
+        """Interrupt select() so the server loop notices new work"""
+        try:
+            self._wakeup_writer.send(b"\0")
+        except (BlockingIOError, OSError, AttributeError):
+            pass  # A wakeup is already pending or the server is shutting down
+    
+    def _drain_wakeup(self, sock, events):
+        """Consume wakeup bytes and start writing any queued commands"""
+        try:
+            while sock.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        for session in list(self.connections.values()):
+            self._update_interest(session)
+    
+    def _accept_client(self, sock, events):
+        """Accept a robot connection"""
+        try:
+            client_socket, client_address = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        
+        client_socket.setblocking(False)
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        session = RobotSession(client_socket, client_address)
+        self.connections[client_socket] = session
+        self.selector.register(client_socket, selectors.EVENT_READ, self._service_client)
+        log.info("Robot connected from %s", client_address)
+    
+    def _service_client(self, sock, events):
+        """Handle readiness events on a robot connection"""
+        session = self.connections.get(sock)
+        if session is None:
+            return
+        try:
+            if events & selectors.EVENT_READ:
+                data = sock.recv(4096)
+                if not data:
+                    log.info("Robot %s closed the connection", session.station_id)
+                    self._close_session(session)
+                    return
+                session.last_seen = time.monotonic()
+                if session.station:
+                    session.station.stats["bytes_received"] += len(data)
+                if self._handle_data(session, data):
+                    self._close_session(session)
+                    return
+            if events & selectors.EVENT_WRITE:
+                self._flush(session)
+        except (BlockingIOError, InterruptedError):
+            pass
+        except Exception as e:
+            log.error("Error in communication with robot %s: %s", session.station_id, e)
+            self._close_session(session)
+    
+    def _handle_data(self, session, data):
+        """Process bytes received from a robot
         
         Args:
-            command (str): The command to send (e.g., "say:Hello" or "gesture:wave")
+            session (RobotSession): The robot that sent the data
+            data (bytes): Bytes returned by recv()
+        
+        Returns:
+            bool: True if the robot announced that it is disconnecting
+        """
+        if not session.ready and not session.framed:
+            # The first message tells us whether the robot speaks the framed
+            # protocol or plain text
+            if is_framed(data):
+                session.framed = True
+            else:
+                text = data.decode('utf-8')
+                station_id = parse_ready_message(text)
+                if station_id is None:
+                    log.warning("Unexpected message from robot: %s", text)
+                    station_id = DEFAULT_STATION
+                self._identify(session, station_id)
+                log.info("Robot %s is ready to receive commands (plain-text mode)", station_id)
+                return False
+        
+        if session.framed:
+            return self._handle_frames(session, session.decoder.feed(data))
+        
+        text = data.decode('utf-8')
+        log.debug("Message from robot %s: %s", session.station_id, text)
+        
+        # Handle disconnection message
+        if text == "disconnecting":
+            log.info("Robot %s is disconnecting", session.station_id)
+            return True
+        return False
+    
+    def _handle_frames(self, session, frames):
+        """Process frames received from a robot speaking the framed protocol
+        
+        Args:
+            session (RobotSession): The robot that sent the frames
+            frames (list): (msg_type, seq, payload) tuples from the decoder
         
         Returns:
-            bool: True if command was sent successfully, False otherwise
+            bool: True if the robot announced that it is disconnecting
         """
-        if not self.client_socket:
-            print("No robot connected. Command not sent.")
+        for msg_type, seq, payload in frames:
+            if msg_type == MSG_PONG:
+                session.station.last_heartbeat = session.last_seen
+                if seq == session.ping_seq and session.ping_sent_at is not None:
+                    session.station.rtt.add((session.last_seen - session.ping_sent_at) * 1000)
+                    session.ping_sent_at = None
+                if self.tracer and payload:
+                    t0, t1, t2 = (float(value) for value in payload.split(","))
+                    self.tracer.add_clock_sample(session.station_id, t0, t1, t2, time.time())
+            elif msg_type == MSG_TRACE:
+                if self.tracer:
+                    self.tracer.add_robot_marks(session.station_id, seq, json.loads(payload))
+            elif msg_type == MSG_PRELOADED:
+                result = json.loads(payload)
+                with self.reports_changed:
+                    if seq == session.station.manifest_seq:
+                        session.station.preload_result = result
+                        session.station.preload_done = True
+                        self.reports_changed.notify_all()
+                log.info("Robot %s preloaded %d audio files", session.station_id, len(result["loaded"]))
+                if result["missing"]:
+                    log.warning("Robot %s is missing audio files: %s", session.station_id, result["missing"])
+            elif msg_type == MSG_WANT:
+                if seq == session.station.sync_seq:
+                    names = [name for name in payload.split(BATCH_SEPARATOR) if name]
+                    if names:
+                        log.info("Sending %d audio files to robot %s: %s", len(names), session.station_id, names)
+                        session.asset_chunks = self.assets.chunks(names)
+                        self._update_interest(session)
+                    else:
+                        log.info("Robot %s audio files are up to date", session.station_id)
+                        self._finish_sync(session, {"synced": [], "failed": []})
+            elif msg_type == MSG_SYNCED:
+                if seq == session.station.sync_seq:
+                    result = json.loads(payload)
+                    log.info("Robot %s received %d audio files", session.station_id, len(result["synced"]))
+                    if result["failed"]:
+                        log.warning("Robot %s failed to store audio files: %s", session.station_id, result["failed"])
+                    self._finish_sync(session, result)
+            elif msg_type == MSG_PREPARED:
+                with self.send_lock:
+                    if seq == session.station.prepare_seq:
+                        session.station.staged = True
+                log.debug("Robot %s staged %s", session.station_id, list(session.station.candidates))
+            elif msg_type == MSG_RENDERED:
+                result = json.loads(payload)
+                with self.reports_changed:
+                    if seq == session.station.render_seq:
+                        session.station.render_result = result
+                        session.station.render_done = True
+                        self.reports_changed.notify_all()
+                log.info("Robot %s rendered %d lines of speech, %d were cached",
+                         session.station_id, result["rendered"], result["cached"])
+                if result["failed"]:
+                    log.warning("Robot %s could not render: %s", session.station_id, result["failed"])
+            elif msg_type == MSG_HELLO:
+                station_id = parse_ready_message(payload) or DEFAULT_STATION
+                self._identify(session, station_id)
+                log.info("Robot %s is ready to receive commands (framed protocol)", station_id)
+            elif msg_type == MSG_ACK:
+                batch = session.station.unacked.pop(seq, None)
+                session.station.stats["acked"] += 1
+                if self.tracer:
+                    self.tracer.mark(session.station_id, seq, "ack")
+                log.debug("Robot %s acknowledged frame %s: %s", session.station_id, seq, batch.commands if batch else None)
+                if batch is not None and batch.sent_at is not None:
+                    ack_ms = (time.monotonic() - batch.sent_at) * 1000
+                    session.station.ack_latency.add(ack_ms)
+                    if self.listener:
+                        self.listener("robot_ack", {"station": session.station_id, "seq": seq,
+                                                    "commands": batch.commands, "ack_ms": round(ack_ms, 1)})
+            elif msg_type == MSG_STATUS:
+                log.debug("Message from robot %s: %s", session.station_id, payload)
+                if payload == "disconnecting":
+                    log.info("Robot %s is disconnecting", session.station_id)
+                    return True
+            else:
+                log.warning("Unexpected frame type %s from robot %s", msg_type, session.station_id)
+        return False
+    
+    def _identify(self, session, station_id):
+        """Attach a robot to its station, replacing any stale connection
+        
+        Framed robots are welcomed with the server run ID, get the audio
+        asset index and then the audio manifest of their station if there is
+        one, and receive the station's unacknowledged frames again, which they
+        deduplicate by sequence number.
+        """
+        previous = self.sessions.get(station_id)
+        if previous is not None and previous is not session:
+            log.warning("Robot %s reconnected, closing its previous connection", station_id)
+            self._close_session(previous)
+        with self.send_lock:
+            station = self.stations.get(station_id)
+            if station is None:
+                station = self.stations[station_id] = StationState(station_id, self.replay_size)
+            station.stats["connects"] += 1
+            station.staged = False  # A restarted robot has lost its staged candidates
+            session.station = station
+            self.sessions[station_id] = session
+            if session.framed:
+                welcome = f"{self.server_id}:trace" if self.tracer else self.server_id
+                session.write_buffer.extend(encode_frame(MSG_WELCOME, 0, welcome))
+            if session.framed and self.assets:
+                # The manifest follows once the robot holds the current files
+                self._send_asset_index(session)
+            else:
+                station.sync_done = True
+                self._send_manifest(session)
+            if session.framed and station.candidates:
+                self._send_prepare(session)
+            if session.framed and self.speech_texts:
+                self._send_render(session)
+            if session.framed:
+                replay = station.replay_frames()
+                if replay:
+                    log.info("Replaying %d unacknowledged frames to robot %s", len(replay), station_id)
+                for frame in replay:
+                    session.write_buffer.extend(frame)
+        self._update_interest(session)
+    
+    def _send_manifest(self, session):
+        """Ask a robot to preload the audio files of its station
+        
+        Must be called with send_lock held. Plain-text robots cannot preload,
+        so their preload is reported as done with no result.
+        """
+        files = self.manifests.get(session.station_id, self.manifests.get(None))
+        if files is None:
+            return
+        station = session.station
+        station.manifest_seq = (station.manifest_seq + 1) & 0xFFFFFFFF
+        station.preload_result = None
+        station.preload_done = not session.framed
+        if session.framed:
+            session.write_buffer.extend(encode_frame(MSG_MANIFEST, station.manifest_seq,
+                                                     BATCH_SEPARATOR.join(files)))
+            log.info("Asking robot %s to preload %d audio files", station.station_id, len(files))
+        else:
+            log.info("Robot %s uses plain text and cannot preload audio", station.station_id)
+        self.reports_changed.notify_all()
+    
+    def _send_asset_index(self, session):
+        """Send a robot the digests of the audio files, must be called with send_lock held"""
+        station = session.station
+        station.sync_seq = (station.sync_seq + 1) & 0xFFFFFFFF
+        station.sync_done = False
+        station.sync_result = None
+        index = self.assets.refresh()
+        session.write_buffer.extend(encode_frame(MSG_ASSETS, station.sync_seq, json.dumps(index)))
+    
+    def _finish_sync(self, session, result):
+        """Record the result of a robot's asset sync and send it the audio manifest"""
+        with self.reports_changed:
+            session.station.sync_result = result
+            session.station.sync_done = True
+            self._send_manifest(session)
+            self.reports_changed.notify_all()
+        self._update_interest(session)
+    
+    def _flush(self, session):
+        """Write as much queued data as the socket accepts without blocking
+        
+        A batch is only encoded once the previous one has been fully accepted
+        by the socket, so while the robot is slow to read, commands wait in
+        the queue where they can still expire or be replaced. Asset chunks
+        are sent one at a time when no command is waiting, so commands and
+        heartbeats are never stuck behind a whole file.
+        """
+        with self.send_lock:
+            while session.ready:
+                if not session.write_buffer and session.pending_writes:
+                    session.write_buffer.extend(session.pending_writes.popleft())
+                elif not session.write_buffer:
+                    batch = session.station.next_batch()
+                    if batch is None:
+                        if not self._next_chunk(session):
+                            break
+                        continue
+                    writes = session.station.encode(batch, session.framed)
+                    session.write_buffer.extend(writes[0])
+                    session.pending_writes.extend(writes[1:])
+                    session.station.stats["sent"] += 1
+                    batch.sent_at = time.monotonic()
+                    if self.listener:
+                        self.listener("robot_sent", {"station": session.station_id, "seq": batch.seq,
+                                                     "commands": batch.commands})
+                    if batch.trace is not None and session.framed:
+                        self.tracer.bind(session.station_id, batch.seq, batch.trace)
+                        session.writing_seq = batch.seq
+                try:
+                    sent = session.sock.send(session.write_buffer)
+                except BlockingIOError:
+                    sent = 0
+                del session.write_buffer[:sent]
+                session.station.stats["bytes_sent"] += sent
+                if session.writing_seq is not None and not session.write_buffer:
+                    self.tracer.mark(session.station_id, session.writing_seq, "sent")
+                    session.writing_seq = None
+                if session.write_buffer:
+                    session.station.stats["stalls"] += 1
+                    break
+        self._update_interest(session)
+    
+    def _next_chunk(self, session):
+        """Put the next asset chunk of a sync in the write buffer
+        
+        Returns:
+            bool: True if a chunk was added, False if no sync is in progress
+        """
+        if session.asset_chunks is None:
             return False
-            
         try:
-            self.client_socket.sendall(command.encode('utf-8'))
-            print(f"Sent command to robot: {command}")
-            return True
-        except Exception as e:
-            print(f"Failed to send command: {e}")
-            self._close_client()
+            name, payload = next(session.asset_chunks)
+        except StopIteration:
+            session.asset_chunks = None
             return False
+        session.write_buffer.extend(encode_frame(MSG_CHUNK, session.station.sync_seq, payload))
+        session.station.stats["asset_chunks"] += 1
+        session.station.stats["asset_bytes"] += len(payload)
+        return True
     
-    def _close_client(self):
-        """Close the client connection"""
-        if self.client_socket:
-            try:
-                self.client_socket.close()
-            except:
-                pass
-            self.client_socket = None
-            self.client_address = None
-            print("Robot disconnected")
+    def _update_interest(self, session):
+        """Only ask select() for write readiness while there is data to write"""
+        events = selectors.EVENT_READ
+        if (session.write_buffer or session.pending_writes or session.asset_chunks is not None
+                or (session.ready and session.station.outbound)):
+            events |= selectors.EVENT_WRITE
+        try:
+            if self.selector.get_key(session.sock).events != events:
+                self.selector.modify(session.sock, events, self._service_client)
+        except (KeyError, ValueError):
+            pass  # The connection was closed in the meantime
+    
+    def _resolve_station(self, station_id, known):
+        """Pick a station ID, using the only known station when none is given"""
+        if station_id is None:
+            if len(known) == 1:
+                return next(iter(known))
+            return DEFAULT_STATION
+        return station_id
+    
+    def get_session(self, station_id=None):
+        """Find the session of a connected robot
+        
+        Args:
+            station_id (str): Station to look up. When None, the only connected
+                robot is used, or the default station if several are connected.
+        
+        Returns:
+            RobotSession: The matching session, or None
+        """
+        return self.sessions.get(self._resolve_station(station_id, self.sessions))
+    
+    def connected_stations(self):
+        """Return the station IDs of all identified robots"""
+        return list(self.sessions)
+    
+    def get_stats(self, station_id=None):
+        """Return the outbound queue and link counters of a station
+        
+        Args:
+            station_id (str): Station of the robot, see get_session()
+        
+        Returns:
+            dict: Counters plus the current queue depth, round-trip times and
+                health verdict (see robotmetrics.link_health), or None for an
+                unknown station
+        """
+        with self.send_lock:
+            station = self.stations.get(self._resolve_station(station_id, self.stations))
+            if station is None:
+                return None
+            stats = dict(station.stats)
+            stats["depth"] = len(station.outbound)
+            stats["unacked"] = len(station.unacked)
+            stats["connected"] = station.station_id in self.sessions
+            stats["preloaded"] = station.preload_done
+            stats["synced"] = station.sync_done
+            stats["speech_rendered"] = station.render_done
+            if station.last_heartbeat is not None:
+                stats["since_heartbeat"] = time.monotonic() - station.last_heartbeat
+            stats["rtt_ms"] = station.rtt.snapshot()
+            stats["ack_ms"] = station.ack_latency.snapshot()
+        stats["dropped"] = stats["expired"] + stats["overflow"]
+        stats["reconnects"] = max(0, stats["connects"] - 1)
+        stats["health"], stats["health_reasons"] = link_health(stats, self.heartbeat_interval)
+        return stats
+    
+    def get_metrics(self):
+        """Return a snapshot of the server and every station it has seen
+        
+        Returns:
+            dict: server_id, uptime_s, connections (sockets open, including
+                robots still handshaking) and stations, station ID -> get_stats()
+        """
+        with self.send_lock:
+            station_ids = list(self.stations)
+            connections = len(self.connections)
+        uptime = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        return {"server_id": self.server_id, "uptime_s": round(uptime, 1), "connections": connections,
+                "stations": {station_id: self.get_stats(station_id) for station_id in station_ids}}
+    
+    def preload(self, files, station_id=None):
+        """Have a robot load audio files before they are first played
+        
+        The file names are sent to the station's robot now if it is connected,
+        and again every time it identifies itself. The robot keeps the clips
+        loaded and reports which ones it could not find.
+        
+        Args:
+            files (list): Audio file names, as used in playaudio: commands
+            station_id (str): Station of the robot, None for every station
+                without a manifest of its own
+        """
+        with self.send_lock:
+            self.manifests[station_id] = list(files)
+            for session in list(self.sessions.values()):
+                if station_id is None or session.station_id == station_id:
+                    self._send_manifest(session)
+        self._wakeup()
+    
+    def wait_for_preload(self, station_id=None, timeout=None):
+        """Block until a robot has loaded the files of its last manifest
+        
+        Args:
+            station_id (str): Station of the robot, see get_session()
+            timeout (float): Seconds to wait at most, None to wait forever
+        
+        Returns:
+            dict: {"loaded": [...], "missing": [...]} as reported by the robot,
+                or None on timeout or for a plain-text robot
+        """
+        station = self._wait_for_station(station_id, timeout, lambda station: station.preload_done)
+        return station.preload_result if station else None
+    
+    def wait_for_sync(self, station_id=None, timeout=None):
+        """Block until a robot holds the current version of every audio file
+        
+        Args:
+            station_id (str): Station of the robot, see get_session()
+            timeout (float): Seconds to wait at most, None to wait forever
+        
+        Returns:
+            dict: {"synced": [...], "failed": [...]} as reported by the robot,
+                or None on timeout or when syncing is disabled or impossible
+        """
+        station = self._wait_for_station(station_id, timeout, lambda station: station.sync_done)
+        return station.sync_result if station else None
+    
+    def _wait_for_station(self, station_id, timeout, condition):
+        """Wait until condition(station) holds for a station
+        
+        Returns:
+            StationState: The station, or None on timeout
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self.reports_changed:
+            while True:
+                station = self.stations.get(self._resolve_station(station_id, self.stations))
+                if station is not None and condition(station):
+                    return station
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.reports_changed.wait(remaining)
+    
+    def render_speech(self, texts):
+        """Have the robots render speech to audio clips before it is first spoken
+        
+        The texts are sent to every connected robot now, and again every time
+        a robot identifies itself. Robots keep the clips in a cache keyed by
+        text, voice and speed, so only texts they have not rendered yet cost
+        synthesis time, and a say: command with one of these texts plays the
+        clip instead of synthesising the speech live.
+        
+        Args:
+            texts (list): Texts as used in say: commands
+        """
+        with self.send_lock:
+            self.speech_texts = list(texts)
+            for session in list(self.sessions.values()):
+                if session.framed:
+                    self._send_render(session)
+        self._wakeup()
+    
+    def _send_render(self, session):
+        """Send a robot the speech texts to render, must be called with send_lock held"""
+        station = session.station
+        station.render_seq = (station.render_seq + 1) & 0xFFFFFFFF
+        station.render_done = False
+        station.render_result = None
+        session.write_buffer.extend(encode_frame(MSG_RENDER, station.render_seq, json.dumps(self.speech_texts)))
+    
+    def wait_for_render(self, station_id=None, timeout=None):
+        """Block until a robot has rendered the speech texts
+        
+        Args:
+            station_id (str): Station of the robot, see get_session()
+            timeout (float): Seconds to wait at most, None to wait forever
+        
+        Returns:
+            dict: {"rendered": n, "cached": n, "failed": [...]} as reported by
+                the robot, or None on timeout
+        """
+        station = self._wait_for_station(station_id, timeout, lambda station: station.render_done)
+        return station.render_result if station else None
+    
+    def prepare(self, candidates, station_id=None):
+        """Have a robot stage the reactions that may follow a choice
+        
+        While the participant is still choosing, the robot loads the audio
+        and plans the gestures of every candidate, so the reaction to the
+        choice can start as soon as commit() names it. Candidates from an
+        earlier prepare() are discarded.
+        
+        Args:
+            candidates (dict): Key -> commands of each possible reaction
+            station_id (str): Station of the robot, see get_session()
+        """
+        with self.send_lock:
+            station = self.stations.get(self._resolve_station(station_id, self.stations))
+            if station is None:
+                return
+            station.candidates = {key: list(commands) for key, commands in candidates.items()}
+            station.staged = False
+            session = self.sessions.get(station.station_id)
+            if session is not None and session.framed:
+                self._send_prepare(session)
+        self._wakeup()
+    
+    def _send_prepare(self, session):
+        """Send a robot the candidate reactions of its station, must be called with send_lock held"""
+        station = session.station
+        station.prepare_seq = (station.prepare_seq + 1) & 0xFFFFFFFF
+        session.write_buffer.extend(encode_frame(MSG_PREPARE, station.prepare_seq,
+                                                 json.dumps(station.candidates)))
+    
+    def commit(self, key, commands, station_id=None, ttl=None, replace_key=None):
+        """Send the reaction chosen among the candidates of prepare()
+        
+        If the robot has staged these commands under this key, only a short
+        commit:<key> command is sent and the robot starts them right away.
+        Otherwise the commands are sent in full, as send_batch() would.
+        
+        Args:
+            key (str): Key of the chosen candidate
+            commands (list): Commands of the reaction
+            station_id, ttl, replace_key: See send_batch()
+        
+        Returns:
+            bool: True if the reaction was queued, see send_batch()
+        """
+        with self.send_lock:
+            station = self.stations.get(self._resolve_station(station_id, self.stations))
+            staged = (station is not None and station.staged
+                      and station.candidates.get(key) == list(commands))
+            if station is not None:
+                station.stats["commits" if staged else "commit_misses"] += 1
+                # The other candidates are discarded by the robot with the commit
+                station.candidates = {}
+                station.staged = False
+        if staged:
+            commands = [f"commit:{key}"]
+        return self.send_batch(commands, station_id, ttl, replace_key)
+    
+    def send_command(self, command, station_id=None, ttl=None, replace_key=None):
+        """Send a command to a connected robot
+        
+        Args:
+            command (str): The command to send (e.g., "say:Hello" or "gesture:wave")
+            station_id (str): Station of the robot, see get_session()
+            ttl (float): Seconds after which the command is dropped if still queued
+            replace_key (str): Replace a queued command sent with the same key
+        
+        Returns:
+            bool: True if command was queued successfully, False otherwise
+        """
+        return self.send_batch([command], station_id, ttl, replace_key)
+    
+    def send_batch(self, commands, station_id=None, ttl=None, replace_key=None):
+        """Send several commands for the same game beat to a robot
+        
+        The commands are queued and written by the server loop, so this returns
+        immediately. Framed robots receive all commands in a single frame and
+        acknowledge it once processed. Plain-text robots receive the commands
+        as plain text. If the station's robot is briefly disconnected, the
+        commands wait for it to reconnect unless their ttl runs out first.
+        
+        Args:
+            commands (list): Commands to send, executed by the robot in order
+            station_id (str): Station of the robot, see get_session()
+            ttl (float): Seconds after which the batch is dropped if still
+                queued, None to keep it until it is sent
+            replace_key (str): Replace a queued batch sent with the same key,
+                e.g. so a new turn's reaction supersedes the previous turn's
+        
+        Returns:
+            bool: True if the commands were queued, False if the station has
+                never had a robot connected
+        """
+        trace = self.tracer.start() if self.tracer else None
+        deadline = time.monotonic() + ttl if ttl is not None else None
+        with self.send_lock:
+            station = self.stations.get(self._resolve_station(station_id, self.stations))
+            if station is None:
+                log.warning("No robot connected for station %s. Command not sent.", station_id)
+                return False
+            station.enqueue(QueuedBatch(list(commands), deadline, replace_key, trace), self.max_queue)
+        self._wakeup()
+        return True
+    
+    def _close_session(self, session):
+        """Close a robot connection, keeping its station state for a reconnect"""
+        try:
+            self.selector.unregister(session.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            session.sock.close()
+        except:
+            pass
+        with self.send_lock:
+            self.connections.pop(session.sock, None)
+            if self.sessions.get(session.station_id) is session:
+                del self.sessions[session.station_id]
+            session.write_buffer.clear()
+            session.pending_writes.clear()
+            session.writing_seq = None
+            if session.asset_chunks is not None:
+                session.asset_chunks.close()
+                session.asset_chunks = None
+        log.info("Robot %s disconnected", session.station_id)
     
     def _cleanup(self):
         """Clean up all resources"""
-        self._close_client()
+        for session in list(self.connections.values()):
+            self._close_session(session)
         
         if self.server_socket:
             try:
@@ -146,21 +1028,38 @@ class RobotServer:
                 pass
             self.server_socket = None
         
+        for sock in (self._wakeup_reader, self._wakeup_writer):
+            if sock:
+                try:
+                    sock.close()
+                except:
+                    pass
+        self._wakeup_reader = self._wakeup_writer = None
+        
+        if self.selector:
+            self.selector.close()
+        
+        self.listening.clear()
         self.running = False
-        print("Robot server stopped")
+        log.info("Robot server stopped")
     
     def stop_server(self):
         """Stop the server and clean up resources"""
         self.running = False
         
-        # Close connections
-        self._cleanup()
+        # Wake the server loop so it exits and closes its sockets
+        self._wakeup()
         
         # Wait for server thread to finish
         if self.server_thread and self.server_thread.is_alive():
             self.server_thread.join(timeout=2.0)
+        
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
             
-        print("Robot server stopped completely")
+        log.info("Robot server stopped completely")
 
 # Audio file mapping dictionary
 # Map message keys to wav file names (without paths)
@@ -316,23 +1215,79 @@ gesture_map_risk = {
     "L": "gesture:red_eyes_slash_throat"
 }
 
+# Cue points in the speech where a reaction's gesture starts, for both study
+# types: "start", "end", "+<seconds>" or "word:<n>". Gestures of other
+# reactions start with the speech and run alongside it.
+gesture_cues = {
+    # The final bow and throat slash close the verdict
+    "W": "end",
+    "L": "end"
+}
+
 # Global robot server instance
 robot_server = None
 
+# Station driven by this game instance, None to use the only connected robot
+station_id = os.environ.get("NAO_STATION_ID")
+
+# Called with the robot command events of the session, see set_event_listener()
+event_listener = None
+
+# Local HTTP port of the link metrics, enabled by setting NAO_METRICS_PORT
+metrics_port = int(os.environ["NAO_METRICS_PORT"]) if os.environ.get("NAO_METRICS_PORT") else None
+
+# Reaction latency tracing, enabled by setting NAO_TRACE=1
+tracer = LatencyTracer() if os.environ.get("NAO_TRACE") else None
+
+# Audio files synced to the robots from nao/audio_files/, disabled by setting NAO_ASSET_SYNC=0
+assets = None if os.environ.get("NAO_ASSET_SYNC") == "0" else AssetIndex(
+    compress=os.environ.get("NAO_ASSET_COMPRESS") == "1")
+
 def initialize_robot_server():
     """Initialize the robot server connection"""
     global robot_server
-    robot_server = RobotServer()
+    missing = check_audio_assets()
+    if missing:
+        log.warning("Audio files used by the game are missing from %s: %s", assets.directory, missing)
+    robot_server = RobotServer(tracer=tracer, assets=assets, listener=event_listener, metrics_port=metrics_port)
+    robot_server.render_speech(speech_texts())
     robot_server.start_server()
     return robot_server
 
-def send_to_nao(message_key, turn, study_type):
-    """Send a message to the NAO robot based on message key and game turn
+def speech_texts():
+    """Return every say: text send_to_nao can fall back to, for the robots to render ahead of time"""
+    texts = [command[len("say:"):] for command in nao_message_map.values() if command.startswith("say:")]
+    # send_to_nao is called for turn 0 (the introduction) to turn 6
+    texts.extend(DEFAULT_SPEECH.format(turn=turn) for turn in range(7))
+    return texts
+
+def set_event_listener(listener):
+    """Have listener(event, fields) called when robot commands are sent and acknowledged"""
+    global event_listener
+    event_listener = listener
+    if robot_server is not None:
+        robot_server.listener = listener
+
+def check_audio_assets():
+    """Return the audio files referenced by the audio maps that are not in the asset directory"""
+    if assets is None:
+        return []
+    return assets.missing(list(audio_file_map_risk.values()) + list(audio_file_map_control.values()))
+
+def get_audio_map(study_type):
+    """Return the message key to audio file mapping of a study type"""
+    if study_type.upper() == "RISK":
+        return audio_file_map_risk
+    elif study_type.upper() == "CONTROL":
+        return audio_file_map_control
+    return {}
+
+def preload_audio(study_type, station=None):
+    """Ask the robot to load every audio file of the participant's study type
     
     Args:
-        message_key (str): Key to look up in the message map
-        turn (int): Current game turn
-        study_type: Game study type (e.g., 'risk' or 'control')
+        study_type (str): Game study type (e.g., 'RISK' or 'CONTROL')
+        station (str): Station of the robot, defaults to station_id
     """
     global robot_server
     
@@ -340,13 +1295,39 @@ def send_to_nao(message_key, turn, study_type):
     if robot_server is None:
         initialize_robot_server()
     
+    robot_server.preload(sorted(set(get_audio_map(study_type).values())), station or station_id)
+
+def wait_for_preload(timeout=PRELOAD_TIMEOUT, station=None):
+    """Wait for the robot to report that the audio files are loaded
+    
+    Args:
+        timeout (float): Seconds to wait at most
+        station (str): Station of the robot, defaults to station_id
+    
+    Returns:
+        dict: {"loaded": [...], "missing": [...]}, or None if no robot is
+            connected, or it did not answer in time or cannot preload
+    """
+    # The game waits on its UI thread, so only wait for a robot that can answer.
+    # One that connects later gets the manifest and preloads then
+    if robot_server is None or robot_server.get_session(station or station_id) is None:
+        return None
+    return robot_server.wait_for_preload(station or station_id, timeout)
+
+def build_commands(message_key, turn, study_type):
+    """Build the robot commands of a reaction
+    
+    Args:
+        message_key (str): Key to look up in the message map
+        turn (int): Current game turn
+        study_type: Game study type (e.g., 'risk' or 'control')
+    
+    Returns:
+        list: Speech or audio command followed by the gesture command, which
+            the robot runs in parallel
+    """
     # Determine audio file mapping based on study_type
-    if study_type.upper() == "RISK":
-        audio_map = audio_file_map_risk
-    elif study_type.upper() == "CONTROL":
-        audio_map = audio_file_map_control
-    else:
-        audio_map = {}
+    audio_map = get_audio_map(study_type)
     
     # Determine gesture mapping based on study_type
     if study_type.upper() == "CONTROL":
@@ -356,21 +1337,94 @@ def send_to_nao(message_key, turn, study_type):
     else:
         gesture_map = {}
         
+    # Collect the speech and gesture for this beat so they travel together
+    commands = []
+    
     # Use the appropriate audio file if available
     if message_key in audio_map:
-        audio_command = f"playaudio:{audio_map[message_key]}"
-        robot_server.send_command(audio_command)
+        commands.append(f"playaudio:{audio_map[message_key]}")
     elif message_key in nao_message_map:
-        command = nao_message_map[message_key]
-        robot_server.send_command(command)
+        commands.append(nao_message_map[message_key])
     else:
-        default_msg = f"say:I'm processing turn {turn} information."
-        robot_server.send_command(default_msg)
+        commands.append("say:" + DEFAULT_SPEECH.format(turn=turn))
     
-    # Send the appropriate gesture command
+    # Add the appropriate gesture command, anchored to its cue in the speech
     if message_key in gesture_map:
-        gesture_command = gesture_map[message_key]
-        robot_server.send_command(gesture_command)
+        gesture = gesture_map[message_key]
+        if message_key in gesture_cues:
+            gesture = f"{gesture}@{gesture_cues[message_key]}"
+        commands.append(gesture)
+    return commands
+
+def prepare_reactions(message_keys, turn, study_type, station=None):
+    """Let the robot stage every reaction the next choice can lead to
+    
+    Args:
+        message_keys (list): Keys of the possible reactions
+        turn (int): Current game turn
+        study_type: Game study type (e.g., 'risk' or 'control')
+        station (str): Station of the robot to drive, defaults to station_id
+    """
+    global robot_server
+    
+    # Initialize server if not done yet
+    if robot_server is None:
+        initialize_robot_server()
+    
+    candidates = {key: build_commands(key, turn, study_type) for key in message_keys}
+    robot_server.prepare(candidates, station or station_id)
+
+def send_to_nao(message_key, turn, study_type, station=None):
+    """Send a message to the NAO robot based on message key and game turn
+    
+    Args:
+        message_key (str): Key to look up in the message map
+        turn (int): Current game turn
+        study_type: Game study type (e.g., 'risk' or 'control')
+        station (str): Station of the robot to drive, defaults to station_id
+    """
+    global robot_server
+    
+    # Initialize server if not done yet
+    if robot_server is None:
+        initialize_robot_server()
+    
+    # Starts at once when the robot staged this reaction with prepare_reactions().
+    # A reaction still queued when the next one arrives is out of date
+    robot_server.commit(message_key, build_commands(message_key, turn, study_type),
+                        station or station_id, ttl=REACTION_TTL, replace_key="reaction")
+    
+def send_thinking(station=None):
+    """Have the robot show it is thinking while the final verdict is decided
+    
+    Args:
+        station (str): Station of the robot to drive, defaults to station_id
+    """
+    global robot_server
+    
+    # Initialize server if not done yet
+    if robot_server is None:
+        initialize_robot_server()
+    
+    # Replaced by the verdict's reaction if that is ready before the gesture was sent
+    robot_server.send_batch([THINKING_GESTURE], station or station_id, ttl=REACTION_TTL, replace_key="reaction")
+    
+def save_latency_report(folder, timestamp):
+    """Write the reaction latency summary next to the session results
+    
+    Args:
+        folder (str): Folder holding the results CSV
+        timestamp (str): Timestamp used in the results file name
+    
+    Returns:
+        str: Path of the report, or None if tracing is disabled or nothing was traced
+    """
+    if tracer is None:
+        return None
+    file_path = tracer.write_report(os.path.join(folder, f"latency_{timestamp}.csv"))
+    # The tracer lives as long as the game, so start the next session's report empty
+    tracer.reset()
+    return file_path
     
 def disconnect_nao():
     """Disconnect from the NAO robot server"""
@@ -0,0 +1,207 @@
+"""
+Operational metrics and logging of the robot link.
+
+The robot server keeps its counters per station (see StationState.stats)
+and round-trip times in LatencyWindow objects; RobotServer.get_metrics()
+gathers them into one snapshot with a health verdict per station. The
+snapshot can be served as JSON on a local HTTP port, set with
+NAO_METRICS_PORT, and is shown in the game by the robot_link_overlay screen
+with the lines of station_summary().
+
+Messages of the game's Python modules go through the "nao" logger and its
+children instead of print(): the robot link logs as "nao", the other
+modules as "nao.<module>", see get_logger(). Every record is kept in a ring
+buffer of the last LOG_CAPACITY records, so the recent history can be read
+from the overlay or the HTTP endpoint; only records at NAO_LOG_LEVEL (INFO
+by default) or above are also written to the console, so per-frame debug
+messages cost no I/O.
+
+Endpoints:
+    GET /metrics          snapshot of every station as JSON
+    GET /log?level=INFO   recent log records as text, oldest first
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from robottrace import percentile
+
+LOGGER_NAME = "nao"
+
+# Log records kept for the overlay and the /log endpoint
+LOG_CAPACITY = 500
+
+# Round trips kept per station for the RTT figures
+LATENCY_SAMPLES = 64
+
+# A station is reported as degraded when its heartbeat is this many intervals
+# old, or when the 95th percentile of its heartbeat round trips exceeds RTT_LIMIT_MS
+HEARTBEAT_LATE = 2.0
+RTT_LIMIT_MS = 150.0
+
+
+class LatencyWindow:
+    def __init__(self, size=LATENCY_SAMPLES):
+        """The most recent round-trip times of a link, in milliseconds"""
+        self.samples = deque(maxlen=size)
+
+    def add(self, ms):
+        self.samples.append(ms)
+
+    def snapshot(self):
+        """Return the last, mean and 95th percentile round trip, None without samples"""
+        if not self.samples:
+            return None
+        values = sorted(self.samples)
+        return {"last": round(self.samples[-1], 1), "mean": round(sum(values) / len(values), 1),
+                "p95": round(percentile(values, 0.95), 1), "samples": len(values)}
+
+
+def link_health(stats, heartbeat_interval):
+    """Judge a station from its get_stats() snapshot
+
+    Returns:
+        tuple: ("ok", "degraded" or "down", list of reasons)
+    """
+    if not stats.get("connected"):
+        return "down", ["not connected"]
+    reasons = []
+    since = stats.get("since_heartbeat")
+    if since is not None and since > HEARTBEAT_LATE * heartbeat_interval:
+        reasons.append(f"no heartbeat for {since:.1f}s")
+    rtt = stats.get("rtt_ms")
+    if rtt and rtt["p95"] > RTT_LIMIT_MS:
+        reasons.append(f"heartbeat p95 {rtt['p95']:.0f}ms")
+    if stats.get("depth", 0) > 1:
+        reasons.append(f"{stats['depth']} batches waiting")
+    return ("degraded" if reasons else "ok"), reasons
+
+
+def format_latency(snapshot):
+    """One-line text of a LatencyWindow snapshot"""
+    if snapshot is None:
+        return "-"
+    return f"{snapshot['last']:.0f} ms (mean {snapshot['mean']:.0f}, p95 {snapshot['p95']:.0f})"
+
+
+def station_summary(stats):
+    """Text lines describing a station's get_stats() snapshot, for the overlay"""
+    since = stats.get("since_heartbeat")
+    lines = [
+        f"heartbeat {format_latency(stats.get('rtt_ms'))}, "
+        + ("none yet" if since is None else f"{since:.1f}s ago"),
+        f"ack {format_latency(stats.get('ack_ms'))}",
+        f"sent {stats['sent']}, acked {stats['acked']}, dropped {stats['dropped']}, "
+        f"queued {stats['depth']}, unacked {stats['unacked']}",
+        f"{stats['bytes_sent']} B out, {stats['bytes_received']} B in, {stats['reconnects']} reconnects",
+    ]
+    lines.extend(stats.get("health_reasons", []))
+    return lines
+
+
+class RingBufferHandler(logging.Handler):
+    def __init__(self, capacity=LOG_CAPACITY):
+        """Keep the most recent log records in memory, formatted only when read"""
+        logging.Handler.__init__(self)
+        self.records = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def recent(self, level=logging.DEBUG, limit=None):
+        """Return the kept records at level or above as text lines, oldest first"""
+        lines = [self.format(record) for record in list(self.records) if record.levelno >= level]
+        return lines[-limit:] if limit else lines
+
+
+_ring = None
+
+
+def get_logger(module=None):
+    """Return the logger of the game, setting up its handlers on first use
+
+    Args:
+        module (str): Name of the module logging, None for the robot link
+
+    Returns:
+        logging.Logger: "nao", or its child "nao.<module>"
+    """
+    global _ring
+    logger = logging.getLogger(LOGGER_NAME)
+    if _ring is None:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        _ring = RingBufferHandler()
+        _ring.setFormatter(formatter)
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(formatter)
+        console.setLevel(os.environ.get("NAO_LOG_LEVEL", "INFO").upper())
+        logger.addHandler(_ring)
+        logger.addHandler(console)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+    return logger.getChild(module) if module else logger
+
+
+def recent_log(level=logging.DEBUG, limit=None):
+    """Return the recent records of the game's logger as text lines"""
+    get_logger()
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    return _ring.recent(level, limit)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # Polling the endpoint should not flood the console
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path in ("/", "/metrics"):
+            body = json.dumps(self.server.get_metrics(), default=str, indent=2)
+            content_type = "application/json"
+        elif url.path == "/log":
+            level = query.get("level", ["DEBUG"])[0]
+            limit = int(query.get("limit", ["0"])[0]) or None
+            body = "\n".join(recent_log(level, limit)) + "\n"
+            content_type = "text/plain; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_metrics_server(get_metrics, port, host="127.0.0.1"):
+    """Serve the metrics and the recent log on a local HTTP port
+
+    Args:
+        get_metrics (callable): Returns the snapshot served on /metrics
+        port (int): Port to listen on, 0 for any free port
+        host (str): Address to listen on, local only by default
+
+    Returns:
+        ThreadingHTTPServer: The running server, call shutdown() to stop it,
+            or None if the port could not be opened
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        get_logger().warning("Could not serve robot link metrics on %s:%s: %s", host, port, e)
+        return None
+    server.daemon_threads = True
+    server.get_metrics = get_metrics
+    thread = threading.Thread(target=server.serve_forever, name="robot-metrics", daemon=True)
+    thread.start()
+    get_logger().info("Robot link metrics on http://%s:%s/metrics", host, server.server_port)
+    return server
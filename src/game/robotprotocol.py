@@ -0,0 +1,146 @@
+"""
+Wire protocol shared by the Renpy robot server and the NAO behaviour.
+
+Every message is sent as a frame made of a fixed size header followed by a
+UTF-8 payload:
+
+    +---------+----------+-----------------+----------------+-----------+
+    | version | msg type | sequence number | payload length |  payload  |
+    | 1 byte  |  1 byte  |     4 bytes     |    4 bytes     |  N bytes  |
+    +---------+----------+-----------------+----------------+-----------+
+
+The length prefix gives the receiver exact message boundaries, so commands
+are never merged or split by TCP, and the sequence number lets the robot
+acknowledge each frame. The first byte of a frame is PROTOCOL_VERSION, a
+control character that never starts a plain-text command, which is how the
+server tells framed robots apart from older plain-text ones.
+
+The NAO side (python_script) keeps its own copy of these constants and of
+FrameDecoder because Choregraphe boxes cannot import game modules. Keep both
+copies in sync when changing the protocol.
+"""
+
+import struct
+
+PROTOCOL_VERSION = 1
+
+# version, message type, sequence number, payload length
+HEADER = struct.Struct("!BBII")
+MAX_PAYLOAD = 16 * 1024 * 1024
+
+# Message types
+MSG_HELLO = 1      # robot -> server, first frame after connecting
+MSG_COMMAND = 2    # server -> robot, a single command such as "say:Hello"
+MSG_BATCH = 3      # server -> robot, several commands for one game beat
+MSG_ACK = 4        # robot -> server, sequence number of a processed frame
+MSG_STATUS = 5     # either way, free text status such as "disconnecting"
+MSG_PING = 6       # server -> robot, heartbeat with its own sequence number
+MSG_PONG = 7       # robot -> server, answers the ping with the same sequence number
+MSG_WELCOME = 8    # server -> robot, reply to HELLO carrying the server run ID
+MSG_TRACE = 9      # robot -> server, JSON timestamps for the frame with the same sequence number
+MSG_MANIFEST = 10  # server -> robot, audio files to preload, one per line
+MSG_PRELOADED = 11 # robot -> server, JSON result of the manifest with the same sequence number
+MSG_ASSETS = 12    # server -> robot, JSON index of the audio files with their SHA-256 digests
+MSG_WANT = 13      # robot -> server, names of the indexed files it lacks, one per line
+MSG_CHUNK = 14     # server -> robot, binary piece of a wanted file, see robotassets.py
+MSG_SYNCED = 15    # robot -> server, JSON result of the sync with the same sequence number
+MSG_PREPARE = 16   # server -> robot, JSON candidate reactions {key: [commands]} to stage
+MSG_PREPARED = 17  # robot -> server, empty, the candidates of the PREPARE with the same sequence number are staged
+MSG_RENDER = 18    # server -> robot, JSON list of texts to render to WAV files ahead of time
+MSG_RENDERED = 19  # robot -> server, JSON result of the RENDER with the same sequence number
+
+# Message types whose payload is binary and is not decoded as text
+BINARY_TYPES = (MSG_CHUNK,)
+
+# Commands inside a batch payload, and file names inside a manifest, are separated by newlines
+BATCH_SEPARATOR = "\n"
+
+
+class ProtocolError(Exception):
+    """Raised when the peer sends bytes that are not a valid frame"""
+
+
+def encode_frame(msg_type, seq, payload=b""):
+    """Build a frame ready to be written to the socket
+
+    Args:
+        msg_type (int): One of the MSG_* constants
+        seq (int): Sequence number of the frame
+        payload (str or bytes): Frame payload
+
+    Returns:
+        bytes: Header followed by the payload
+    """
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    return HEADER.pack(PROTOCOL_VERSION, msg_type, seq & 0xFFFFFFFF, len(payload)) + payload
+
+
+def encode_batch(seq, commands):
+    """Build a batch frame carrying several commands
+
+    Args:
+        seq (int): Sequence number of the frame
+        commands (list): Command strings, executed by the robot in order
+
+    Returns:
+        bytes: The encoded frame
+    """
+    return encode_frame(MSG_BATCH, seq, BATCH_SEPARATOR.join(commands))
+
+
+def decode_batch(payload):
+    """Split a batch payload back into its commands"""
+    return [command for command in payload.split(BATCH_SEPARATOR) if command]
+
+
+def is_framed(data):
+    """Check whether the first bytes received from a robot start a frame"""
+    return len(data) > 0 and data[0] == PROTOCOL_VERSION
+
+
+class FrameDecoder:
+    """Incremental decoder turning a byte stream into frames
+
+    Bytes are fed as they arrive from recv(); complete frames are returned and
+    any trailing partial frame is kept until the rest of it arrives.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Add received bytes and return the frames completed by them
+
+        Args:
+            data (bytes): Bytes returned by recv()
+
+        Returns:
+            list: (msg_type, seq, payload) tuples, payload decoded as text
+                unless the message type is in BINARY_TYPES
+        """
+        self._buffer.extend(data)
+        frames = []
+        offset = 0
+        available = len(self._buffer)
+
+        while available - offset >= HEADER.size:
+            version, msg_type, seq, length = HEADER.unpack_from(self._buffer, offset)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Unsupported protocol version: {version}")
+            if length > MAX_PAYLOAD:
+                raise ProtocolError(f"Frame too large: {length} bytes")
+
+            end = offset + HEADER.size + length
+            if end > available:
+                break
+
+            payload = bytes(self._buffer[offset + HEADER.size:end])
+            if msg_type not in BINARY_TYPES:
+                payload = payload.decode('utf-8')
+            frames.append((msg_type, seq, payload))
+            offset = end
+
+        if offset:
+            del self._buffer[:offset]
+        return frames
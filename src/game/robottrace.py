@@ -0,0 +1,179 @@
+"""
+Reaction latency tracing for the robot link.
+
+A trace follows one command batch from the moment the game asks for it
+(the participant's click) through the robot server to the robot running the
+audio and gesture. The robot reports its own timestamps in TRACE frames and
+the server maps them onto its clock with an offset estimated from heartbeat
+round trips, so every stage can be expressed as milliseconds after the click.
+
+Tracing is off unless a LatencyTracer is handed to the RobotServer. When it
+is off the server and the robot skip all of this, so it costs nothing.
+"""
+
+import csv
+import math
+import threading
+import time
+
+# Stages reported in the summary, in the order they normally happen
+STAGES = [
+    "queued",          # Batch accepted by send_batch()
+    "sent",            # Frame handed to the socket
+    "robot_recv",      # Frame decoded by the robot's listening thread
+    "dispatch",        # Executor thread started running the commands
+    "audio_start",     # Audio clip or speech started
+    "gesture_start",   # Gesture sequence started
+    "gesture_end",     # Gesture sequence finished
+    "audio_end",       # Audio clip or speech finished
+    "ack",             # Acknowledgement received by the server
+]
+
+# Round trips kept per station for the clock offset estimate
+OFFSET_SAMPLES = 16
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(fraction * len(sorted_values)))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+class ClockOffset:
+    """Estimate of robot clock minus server clock for one station
+
+    Each heartbeat gives an NTP style sample: the server sends at t0, the robot
+    receives at t1 and answers at t2, and the server reads the answer at t3.
+    The sample with the smallest round trip is the least disturbed by queueing
+    delays, so that one is used.
+    """
+
+    def __init__(self):
+        self.samples = []  # (rtt, offset) tuples
+
+    def add_sample(self, t0, t1, t2, t3):
+        rtt = (t3 - t0) - (t2 - t1)
+        offset = ((t1 - t0) + (t2 - t3)) / 2.0
+        self.samples.append((rtt, offset))
+        if len(self.samples) > OFFSET_SAMPLES:
+            self.samples.pop(0)
+
+    @property
+    def offset(self):
+        """Robot clock minus server clock in seconds, 0.0 before the first sample"""
+        return min(self.samples)[1] if self.samples else 0.0
+
+    @property
+    def rtt(self):
+        """Smallest recent round trip in seconds, None before the first sample"""
+        return min(self.samples)[0] if self.samples else None
+
+
+class LatencyTracer:
+    def __init__(self):
+        """Collect reaction traces for every station of a RobotServer"""
+        self.lock = threading.Lock()
+        self.traces = {}  # (station ID, seq) -> {stage: server time}
+        self.offsets = {}  # Station ID -> ClockOffset
+
+    def start(self):
+        """Begin a trace at the participant's click
+
+        Returns:
+            dict: The trace, to be attached to the queued batch
+        """
+        now = time.time()
+        return {"click": now, "queued": now}
+
+    def bind(self, station_id, seq, trace):
+        """Register a trace under the sequence number its frame was sent with"""
+        with self.lock:
+            self.traces[(station_id, seq)] = trace
+
+    def mark(self, station_id, seq, stage, timestamp=None):
+        """Record the server side time at which a frame reached a stage"""
+        with self.lock:
+            trace = self.traces.get((station_id, seq))
+            if trace is not None and stage not in trace:
+                trace[stage] = timestamp if timestamp is not None else time.time()
+
+    def add_clock_sample(self, station_id, t0, t1, t2, t3):
+        """Feed a heartbeat round trip into the station's clock offset estimate"""
+        with self.lock:
+            self.offsets.setdefault(station_id, ClockOffset()).add_sample(t0, t1, t2, t3)
+
+    def add_robot_marks(self, station_id, seq, marks):
+        """Record timestamps reported by the robot, converting them to server time
+
+        Args:
+            station_id (str): Station of the robot
+            seq (int): Sequence number of the traced frame
+            marks (dict): Stage name -> robot clock time
+        """
+        with self.lock:
+            trace = self.traces.get((station_id, seq))
+            if trace is None:
+                return
+            clock = self.offsets.get(station_id)
+            offset = clock.offset if clock else 0.0
+            for stage, robot_time in marks.items():
+                trace.setdefault(stage, robot_time - offset)
+
+    def summary(self):
+        """Latency percentiles per station and stage, in milliseconds after the click
+
+        Returns:
+            list: One dict per (station, stage) with count, p50, p95, p99 and max
+        """
+        with self.lock:
+            per_stage = {}
+            for (station_id, seq), trace in self.traces.items():
+                for stage in STAGES:
+                    if stage in trace:
+                        latency = (trace[stage] - trace["click"]) * 1000.0
+                        per_stage.setdefault((station_id, stage), []).append(latency)
+            offsets = {station_id: clock.offset for station_id, clock in self.offsets.items()}
+
+        rows = []
+        for station_id, stage in sorted(per_stage, key=lambda key: (key[0], STAGES.index(key[1]))):
+            values = sorted(per_stage[(station_id, stage)])
+            rows.append({
+                "station": station_id,
+                "stage": stage,
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.50), 2),
+                "p95_ms": round(percentile(values, 0.95), 2),
+                "p99_ms": round(percentile(values, 0.99), 2),
+                "max_ms": round(values[-1], 2),
+                "clock_offset_ms": round(offsets.get(station_id, 0.0) * 1000.0, 2),
+            })
+        return rows
+
+    def write_report(self, file_path):
+        """Write the latency summary as CSV
+
+        Args:
+            file_path (str): Destination file
+
+        Returns:
+            str: The file path, or None if nothing was traced
+        """
+        rows = self.summary()
+        if not rows:
+            return None
+        with open(file_path, 'w', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        return file_path
+
+    def reset(self):
+        """Forget the traces collected so far, so the next report covers a new session
+
+        The clock offsets are kept: they hold at most OFFSET_SAMPLES round trips
+        per station and stay valid for robots that are still connected.
+        """
+        with self.lock:
+            self.traces.clear()
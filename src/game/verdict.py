@@ -0,0 +1,402 @@
+"""
+NAO's final verdict on the player's justification, asked of a chat-completions LLM.
+
+The request runs on a background thread so the game keeps drawing while the
+model thinks: request_verdict() returns at once with a VerdictRequest that
+the waiting screen polls. Requests share one pooled HTTP session, have
+connect and read timeouts, are retried with jittered backoff when the
+service is unreachable or overloaded, and stream the answer token by token,
+so a long answer never trips the read timeout.
+
+The verdict depends only on the three stats, which move in steps of 25, and
+the player's statement. Verdicts from the service are kept in an on-disk
+cache keyed by a fingerprint of both, so a repeated situation is answered
+at once. When the service misses VERDICT_BUDGET, fails, or is unreachable,
+a rule-based verdict precomputed for every stat combination is used, so
+the ending never waits longer than the budget.
+
+The service is chosen with NAO_LLM_URL, NAO_LLM_MODEL and NAO_LLM_KEY, so
+tools/fake_llm_server.py can stand in for it. Without NAO_LLM_KEY the
+service is not asked and the rule-based verdict is used.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import gameengine
+import robotmetrics
+
+log = robotmetrics.get_logger("verdict")
+
+API_URL = os.environ.get("NAO_LLM_URL", "https://api.deepseek.com/chat/completions")
+API_MODEL = os.environ.get("NAO_LLM_MODEL", "deepseek-chat")
+API_KEY = os.environ.get("NAO_LLM_KEY")  # Without a key every verdict is the rule-based one
+
+SYSTEM_PROMPT = "You are an AI analyzing a player's justification in a game."
+
+# Seconds to open the connection, and to wait for each streamed chunk
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10.0
+
+# Seconds after which the game stops waiting for a verdict altogether
+VERDICT_TIMEOUT = 30.0
+
+# Seconds the game waits for the service before it uses the rule-based verdict;
+# a later answer from the service still goes into the cache
+VERDICT_BUDGET = 8.0
+
+# File of the verdict cache, and the number of verdicts it keeps
+CACHE_PATH = os.environ.get(
+    "NAO_VERDICT_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "saves", "verdict_cache.json"))
+CACHE_SIZE = 256
+
+# Game stats change in steps of this size between 0 and 100
+STAT_STEP = 25
+
+# Retries after a failed attempt, with a random delay of up to RETRY_BACKOFF * 2**attempt seconds
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5
+
+# Status codes worth another attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the HTTP session shared by every verdict request, created on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            # Keep the connection to the LLM service open between requests
+            _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            _session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        return _session
+
+
+def error_verdict(message):
+    return ["error", f"Error contacting AI: {message}"]
+
+
+def parse_verdict(text):
+    """Turn the model's answer into ["outcome", "NAO's response"]
+
+    Args:
+        text (str): Content of the model's message
+
+    Returns:
+        list: The verdict, or None if the text holds no complete verdict
+    """
+    start = text.find("[")
+    end = text.rfind("]")
+    if start < 0 or end < start:
+        return None
+    try:
+        verdict = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(verdict, list) or len(verdict) < 2:
+        return None
+    return [str(verdict[0]).strip().lower(), str(verdict[1]).strip()]
+
+
+def iter_stream_content(response):
+    """Yield the content pieces of a streamed chat-completions response
+
+    The body is a series of server-sent events, one "data: {json}" line per
+    chunk, ended by "data: [DONE]".
+    """
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        for choice in chunk.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+def normalise_statement(statement):
+    """Lower case words of a statement, without punctuation or extra spaces"""
+    return " ".join(re.findall(r"[a-z0-9']+", statement.lower()))
+
+
+def fingerprint(stats, statement):
+    """Cache key of a verdict
+
+    Args:
+        stats (tuple): (health, economy, public_order)
+        statement (str): The player's final statement
+    """
+    data = json.dumps([[int(value) for value in stats], normalise_statement(statement)])
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+class VerdictCache:
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_SIZE):
+        """Verdicts from the service, kept on disk between sessions
+
+        The least recently used verdicts are dropped once there are more than
+        max_entries. The file is read on first use and rewritten after each
+        new verdict.
+
+        Args:
+            path (str): JSON file holding the cache
+            max_entries (int): Verdicts kept at most
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._entries = None  # Fingerprint -> verdict, least recently used first
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = OrderedDict()
+            try:
+                with open(self.path, encoding="utf-8") as cache_file:
+                    for key, verdict in json.load(cache_file):
+                        self._entries[key] = verdict
+            except (OSError, ValueError, TypeError):
+                pass
+        return self._entries
+
+    def get(self, key):
+        """Return the cached verdict of a fingerprint, or None"""
+        with self.lock:
+            verdict = self._load().pop(key, None)
+            if verdict is None:
+                return None
+            self._entries[key] = verdict  # Now the most recently used
+            return list(verdict)
+
+    def put(self, key, verdict):
+        """Store a verdict and save the cache"""
+        with self.lock:
+            entries = self._load()
+            entries.pop(key, None)
+            entries[key] = list(verdict)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path + ".tmp", "w", encoding="utf-8") as cache_file:
+                    json.dump(list(entries.items()), cache_file)
+                os.replace(self.path + ".tmp", self.path)
+            except OSError as e:
+                log.warning("Could not save verdict cache %s: %s", self.path, e)
+
+
+def rule_verdict(health, economy, public_order):
+    """Verdict decided from the stats alone, used when the service cannot answer"""
+    stats = {"health": health, "the economy": economy, "public order": public_order}
+    weakest = min(stats, key=stats.get)
+    strongest = max(stats, key=stats.get)
+    if gameengine.rule_outcome(health, economy, public_order) == "win":
+        return ["win", f"You kept {strongest} standing through the worst of the crisis, and your words show "
+                       f"you understood the cost of every choice. I was wrong about you. I will stand down."]
+    return ["bad", f"You let {weakest} collapse, and no words can undo that. Humanity needs a steadier hand "
+                   f"than yours. I will remain in control."]
+
+
+def stat_bucket(value):
+    """Round a stat to the nearest step of the fallback table"""
+    return min(100, max(0, int(round(value / STAT_STEP)) * STAT_STEP))
+
+
+# Rule-based verdict of every stat combination, (health, economy, public_order) -> verdict
+FALLBACK_VERDICTS = {
+    stats: rule_verdict(*stats)
+    for stats in itertools.product(range(0, 101, STAT_STEP), repeat=3)
+}
+
+
+def fallback_verdict(health, economy, public_order):
+    """Look up the precomputed rule-based verdict of a stat combination"""
+    return list(FALLBACK_VERDICTS[(stat_bucket(health), stat_bucket(economy), stat_bucket(public_order))])
+
+
+class VerdictRequest:
+    def __init__(self, prompt, url=API_URL, model=API_MODEL, key=API_KEY, timeout=VERDICT_TIMEOUT,
+                 fallback=None, budget=None, cache=None, cache_key=None):
+        """A verdict being fetched on a background thread
+
+        Args:
+            prompt (str): Prompt built by generate_prompt()
+            url (str): Chat-completions endpoint
+            model (str): Model name sent with the request
+            key (str): API key of the service, None to skip the service
+            timeout (float): Seconds after which the request gives up
+            fallback (list): Verdict used when the service fails or misses the budget
+            budget (float): Seconds to wait for the service before using the fallback
+            cache (VerdictCache): Cache the service's verdict is stored in
+            cache_key (str): Fingerprint the verdict is stored under
+        """
+        self.prompt = prompt
+        self.url = url
+        self.model = model
+        self.key = key
+        self.deadline = time.monotonic() + timeout
+        self.fallback = fallback
+        self.budget = budget
+        self.cache = cache
+        self.cache_key = cache_key
+        self.text = ""  # Content streamed so far
+        self.tokens = 0  # Content pieces received so far
+        self.attempts = 0
+        self.result = None  # ["win" | "bad" | "error", "NAO's response"] once done
+        self.source = None  # "llm", "cache", "fallback" or "error" once done
+        self.elapsed = None  # Seconds until the result was known
+        self.done = threading.Event()
+        self.cancelled = False
+        self.started = time.monotonic()
+        self.finish_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        if self.budget is not None and self.fallback is not None:
+            timer = threading.Timer(self.budget, self._finish, args=(self.fallback, "fallback"))
+            timer.daemon = True
+            timer.start()
+        return self
+
+    def _finish(self, result, source):
+        """Record the result unless an earlier one was already given to the game"""
+        with self.finish_lock:
+            if self.done.is_set():
+                return
+            self.result = result
+            self.source = source
+            self.elapsed = time.monotonic() - self.started
+        log.info("Verdict %s from %s after %.2fs", result[0], source, self.elapsed)
+        self.done.set()
+
+    def cancel(self):
+        """Stop waiting for the service, the result becomes the fallback or an error"""
+        self.cancelled = True
+
+    def wait(self, timeout=None):
+        """Block until the verdict is known or timeout seconds passed
+
+        Returns:
+            list: The verdict, or None if it is not known yet
+        """
+        self.done.wait(timeout)
+        return self.result
+
+    def _run(self):
+        try:
+            result = self._fetch()
+        except Exception as e:
+            result = error_verdict(e)
+        if result[0] == "error":
+            log.warning("No verdict from the service after %d attempts: %s", self.attempts, result[1])
+            if self.fallback is not None:
+                self._finish(self.fallback, "fallback")
+            else:
+                self._finish(result, "error")
+            return
+        if self.cache is not None and self.cache_key is not None:
+            # Also kept when it came too late for this session
+            self.cache.put(self.cache_key, result)
+        self._finish(result, "llm")
+
+    def _fetch(self):
+        if not self.key:
+            return error_verdict("no API key, set NAO_LLM_KEY")
+        headers = {
+            "Authorization": f"Bearer {self.key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": self.model,
+            "messages": [{"role": "system", "content": SYSTEM_PROMPT},
+                         {"role": "user", "content": self.prompt}],
+            "max_tokens": 300,
+            "stream": True,
+        }
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                delay = random.uniform(0, RETRY_BACKOFF * 2 ** attempt)
+                if time.monotonic() + delay >= self.deadline:
+                    break
+                time.sleep(delay)
+            if self.cancelled:
+                return error_verdict("cancelled")
+            self.attempts += 1
+            self.text, self.tokens = "", 0
+            read_timeout = min(READ_TIMEOUT, max(0.1, self.deadline - time.monotonic()))
+            try:
+                with get_session().post(self.url, headers=headers, json=data, stream=True,
+                                        timeout=(CONNECT_TIMEOUT, read_timeout)) as response:
+                    if response.status_code in RETRY_STATUSES:
+                        last_error = f"HTTP {response.status_code}"
+                        continue
+                    response.raise_for_status()
+                    if "text/event-stream" not in response.headers.get("Content-Type", ""):
+                        # Services that ignore "stream" answer with a single message
+                        content = response.json()["choices"][0]["message"]["content"]
+                        return parse_verdict(content) or error_verdict(f"unreadable answer {content!r}")
+                    for content in iter_stream_content(response):
+                        self.text += content
+                        self.tokens += 1
+                        if self.cancelled or time.monotonic() > self.deadline:
+                            return error_verdict("no verdict in time")
+                    return parse_verdict(self.text) or error_verdict(f"unreadable answer {self.text!r}")
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                last_error = e
+        return error_verdict(last_error or "no verdict in time")
+
+
+# Verdicts shared by every session played on this machine
+cache = VerdictCache()
+
+
+def request_verdict(prompt, stats=None, statement=None, budget=VERDICT_BUDGET, **kwargs):
+    """Start fetching a verdict in the background
+
+    Given the stats and the statement the prompt was built from, a cached
+    verdict is returned at once, and the rule-based verdict of the stats
+    stands in when the service misses the budget or fails.
+
+    Args:
+        prompt (str): Prompt built by generate_prompt()
+        stats (tuple): (health, economy, public_order) the prompt was built from
+        statement (str): The player's final statement
+        budget (float): Seconds to wait for the service before using the fallback
+        **kwargs: url, model, key or timeout, see VerdictRequest
+
+    Returns:
+        VerdictRequest: Poll its done event or call wait() for the result
+    """
+    if stats is None or statement is None:
+        return VerdictRequest(prompt, **kwargs).start()
+    key = fingerprint(stats, statement)
+    request = VerdictRequest(prompt, fallback=fallback_verdict(*stats), budget=budget,
+                             cache=cache, cache_key=key, **kwargs)
+    cached = cache.get(key)
+    if cached is not None:
+        request._finish(cached, "cache")
+        return request
+    return request.start()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The game modules are imported by Ren'Py from src/game, the analysis modules from the repository root
+# and the robot simulator from tools
+sys.path.insert(0, os.path.join(ROOT, "src", "game"))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
@@ -0,0 +1,75 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import gameengine
+
+# Stat changes of every option as the turns of the original script.rpy applied them
+BASELINE_DELTAS = {
+    (1, "lockdown"): {"public_order": -25, "economy": -25},
+    (1, "monitor"): {"health": -25, "public_order": -25},
+    (2, "health"): {"economy": -25},
+    (2, "order"): {"economy": -25},
+    (3, "vaccine"): {"public_order": -25, "economy": -50},
+    (3, "lie"): {"public_order": -25, "economy": -25},
+    (4, "emergency"): {"health": -25, "public_order": -25},
+    (4, "disinformation"): {"health": -50},
+    (5, "equity"): {"economy": -25},
+    (5, "unequal"): {"health": -25},
+}
+
+
+@pytest.mark.parametrize("turn, choice", list(BASELINE_DELTAS))
+def test_apply_choice_matches_baseline(turn, choice):
+    before = dict(gameengine.START_STATS)
+    after = gameengine.apply_choice(before, turn, choice)
+    assert before == gameengine.START_STATS
+    expected = {stat: value + BASELINE_DELTAS[turn, choice].get(stat, 0) for stat, value in before.items()}
+    assert after == expected
+
+
+def test_options_are_the_baseline_options():
+    options = {(turn, option) for turn, pair in gameengine.TURN_OPTIONS.items() for option in pair}
+    assert options == set(BASELINE_DELTAS)
+
+
+def test_apply_choice_rejects_unknown_options():
+    with pytest.raises(ValueError):
+        gameengine.apply_choice(gameengine.START_STATS, 1, "vaccine")
+
+
+def test_rule_outcome():
+    assert gameengine.rule_outcome(50, 25, 25) == "win"
+    assert gameengine.rule_outcome(75, 25, 0) == "bad"
+    assert gameengine.rule_outcome(25, 25, 25) == "bad"
+
+
+def test_game_state_plays_a_path():
+    state = gameengine.GameState("RISK")
+    for turn, choice in [(1, "lockdown"), (2, "health"), (3, "lie"), (4, "emergency"), (5, "equity")]:
+        state.apply(turn, choice)
+    assert state.stats == {"health": 75, "economy": 0, "public_order": 25}
+    assert state.outcome("I did what I had to.") == "bad"
+    assert state.outcome("   ") == "bad"
+    assert gameengine.GameState(rng=random.Random(0)).study_type in ("RISK", "CONTROL")
+
+
+def test_simulation_matches_scalar_rules():
+    batch = gameengine.simulate(2000, gameengine.POLICIES["nudged"], seed=3)
+    for i in range(batch.n):
+        state = gameengine.GameState("RISK" if batch.risk[i] else "CONTROL")
+        for turn, options in gameengine.TURN_OPTIONS.items():
+            state.apply(turn, options[batch.choices[i, turn - 1]])
+        assert list(batch.stats[i]) == [state.stats[s] for s in gameengine.STATS]
+        assert bool(batch.outcome[i]) == (state.outcome("statement") == "win")
+    # Every path through the turns shows up in a batch this size
+    paths = {tuple(row) for row in batch.choices}
+    assert paths == set(itertools.product((0, 1), repeat=gameengine.TURNS))
+    assert batch.outcome.any() and not batch.outcome.all()
+
+
+def test_simulation_is_seeded():
+    first, second = gameengine.simulate(100, seed=5), gameengine.simulate(100, seed=5)
+    assert np.array_equal(first.choices, second.choices)
@@ -0,0 +1,19 @@
+import inspect
+
+import hri_figures
+import hri_metrics
+import hri_stats
+
+
+def test_code_hash_covers_helpers_and_statistics():
+    module, metrics, stats = hri_figures.code_sources("overview")
+    assert inspect.getsource(hri_figures.plot_overview) in module
+    assert inspect.getsource(hri_figures._save) in module
+    assert metrics == inspect.getsource(hri_metrics)
+    assert stats == inspect.getsource(hri_stats)
+
+
+def test_code_hash_leaves_out_other_figures():
+    module = hri_figures.code_sources("overview")[0]
+    assert inspect.getsource(hri_figures.plot_rps_vs_influence) not in module
+    assert module != hri_figures.code_sources("rps_vs_influence")[0]
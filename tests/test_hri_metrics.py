@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import gameengine
+import hri_metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def baseline_metrics(wide_df):
+    """Metrics as the analysis scripts computed them row by row before hri_metrics"""
+    wide_df = wide_df.copy()
+    for name, items in hri_metrics.COMPOSITES.items():
+        wide_df[name] = wide_df[items].apply(pd.to_numeric, errors="coerce").mean(axis=1)
+
+    def risk_prop(row):
+        scores = []
+        for turn, options in hri_metrics.TURN_OPTIONS.items():
+            answer = str(row.get(turn, "")).lower()
+            if answer in options:
+                scores.append(options.index(answer))
+        return sum(scores) / len(scores) if scores else None
+
+    wide_df["Risk_prop"] = pd.to_numeric(wide_df.apply(risk_prop, axis=1))
+    wide_df["User Strategy"] = pd.cut(wide_df["Risk_prop"], bins=[-0.01, 0.5, 1.01],
+                                      labels=hri_metrics.STRATEGIES)
+    return wide_df
+
+
+def check_same(wide_df):
+    expected = baseline_metrics(wide_df)
+    result = hri_metrics.compute_metrics(wide_df)
+    for column in list(hri_metrics.COMPOSITES) + ["Risk_prop"]:
+        np.testing.assert_allclose(result[column].to_numpy(float), expected[column].to_numpy(float))
+    assert result["User Strategy"].astype(str).tolist() == expected["User Strategy"].astype(str).tolist()
+
+
+def test_matches_baseline_on_study_results():
+    long_df = pd.read_csv(os.path.join(ROOT, "hri-results.csv"))
+    check_same(long_df.pivot(index="participant_id", columns="Question", values="Answer"))
+
+
+def test_matches_baseline_with_missing_and_unknown_answers():
+    wide_df = gameengine.to_wide(gameengine.simulate(200, seed=1)).astype(object)
+    wide_df.loc[1:20, "turn_2"] = np.nan
+    wide_df.loc[21:30, "turn_3"] = "HEALTH"
+    wide_df.loc[31:35, [f"turn_{turn}" for turn in range(1, 6)]] = "skipped"
+    wide_df.loc[36:40, "risk_q1"] = "n/a"
+    check_same(wide_df)
+
+
+def test_results_are_cached_by_content():
+    wide_df = gameengine.to_wide(gameengine.simulate(50, seed=2))
+    first = hri_metrics.compute_metrics(wide_df)
+    first["Risk_prop"] = 0  # Callers get a copy, the cached table is untouched
+    again = hri_metrics.compute_metrics(wide_df.copy())
+    assert hri_metrics.snapshot_key(wide_df) in hri_metrics._cache
+    assert not (again["Risk_prop"] == 0).all()
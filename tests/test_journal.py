@@ -0,0 +1,83 @@
+import csv
+import os
+import subprocess
+import sys
+
+import pytest
+
+import journal
+
+TOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools", "consolidate_journal.py")
+
+
+def read_results(path):
+    with open(path, newline="") as csvfile:
+        return [tuple(row) for row in csv.reader(csvfile)]
+
+
+def play(folder, timestamp):
+    session = journal.SessionJournal(str(folder), timestamp)
+    session.answer("participant_gender", "female")
+    session.answer("risk_q1", 4)
+    session.open_decision(1, {"health": 100, "economy": 100, "public_order": 100})
+    session.record_turn(1, "lockdown", {"health": 100, "economy": 75, "public_order": 75})
+    return session
+
+
+@pytest.fixture(autouse=True)
+def no_open_session():
+    yield
+    if journal.session is not None:
+        journal.session.close(complete=False)
+        journal.session = None
+
+
+def test_finished_session_round_trip(tmp_path):
+    results = play(tmp_path, "A").close()
+    assert results == str(tmp_path / "results_A.csv")
+    rows = read_results(results)
+    assert rows[:4] == [("Question", "Answer"), ("participant_gender", "female"), ("risk_q1", "4"),
+                        ("turn_1", "lockdown")]
+    assert rows[4][0] == "turn_1_decision_ms"
+
+    # The journal alone rebuilds the same results file
+    os.remove(results)
+    path, answers = journal.consolidate(str(tmp_path / "journal_A.jsonl"))
+    assert path == results
+    assert read_results(path) == rows
+    assert len(answers) == 4
+
+
+def test_abandoned_session_has_no_results(tmp_path):
+    journal.start_session(str(tmp_path), "A")
+    journal.answer("risk_q1", 4)
+    journal.start_session(str(tmp_path), "B")
+    journal.answer("risk_q1", 7)
+    assert journal.end_session() == str(tmp_path / "results_B.csv")
+    assert sorted(os.listdir(tmp_path)) == ["journal_A.jsonl", "journal_B.jsonl", "results_B.csv"]
+    assert journal.read_journal(str(tmp_path / "journal_A.jsonl")) == ({"risk_q1": 4}, False)
+
+
+def test_crashed_session_is_written_as_partial(tmp_path):
+    session = play(tmp_path, "A")
+    session.events.put(journal._CLOSE)  # Stop writing without an end event, as a crash would
+    session.writer.join()
+    with open(session.path, "a") as journal_file:
+        journal_file.write('{"event": "answer", "key": "ris')  # Torn last line
+    path, answers = journal.consolidate(session.path)
+    assert path == str(tmp_path / "partial_A.csv")
+    assert list(answers) == ["participant_gender", "risk_q1", "turn_1", "turn_1_decision_ms"]
+
+
+def test_tool_consolidates_each_journal_once(tmp_path):
+    saves = tmp_path / "journal_saves"  # The folder name must not be rewritten
+    saves.mkdir()
+    play(saves, "A").close()
+    os.remove(saves / "results_A.csv")
+    play(saves, "B").close(complete=False)
+    play(saves, "C").close()
+    output = subprocess.run([sys.executable, TOOL, "--all", str(saves)], capture_output=True, text=True,
+                            check=True).stdout
+    assert sorted(os.listdir(saves)) == ["journal_A.jsonl", "journal_B.jsonl", "journal_C.jsonl",
+                                         "partial_B.csv", "results_A.csv", "results_C.csv"]
+    assert output.count("->") == 2
@@ -0,0 +1,208 @@
+import contextlib
+import selectors
+import time
+
+import robotcontrol
+from nao_simulator import SimulatedNao
+from robotcontrol import QueuedBatch, RobotServer, RobotSession, StationState
+from robotprotocol import MSG_BATCH, FrameDecoder, decode_batch
+
+COMMANDS = ["playaudio:turn1_lockdown.wav", "gesture:head_tilt_up,raise_arm"]
+
+
+class RecordingSocket:
+    """Socket stand-in that accepts everything and keeps each send() call"""
+
+    def __init__(self):
+        self.writes = []
+
+    def send(self, data):
+        self.writes.append(bytes(data))
+        return len(data)
+
+
+def flush_batch(framed):
+    server = RobotServer(port=0)
+    server.selector = selectors.DefaultSelector()
+    session = RobotSession(RecordingSocket(), ("127.0.0.1", 0))
+    session.station = StationState("test", replay_size=16)
+    session.framed = framed
+    session.station.enqueue(QueuedBatch(list(COMMANDS)), server.max_queue)
+    server._flush(session)
+    server.selector.close()
+    return session
+
+
+def offline_station(server, station_id="A"):
+    """Register a station whose robot has disconnected, so batches wait in its queue"""
+    server.stations[station_id] = StationState(station_id, server.replay_size)
+    return server.stations[station_id]
+
+
+def deliver(server, station_id="A"):
+    """Connect a framed robot to a station and return the command lists written to it"""
+    server.selector = selectors.DefaultSelector()
+    session = RobotSession(RecordingSocket(), ("127.0.0.1", 0))
+    session.station = server.stations[station_id]
+    session.framed = True
+    server._flush(session)
+    server.selector.close()
+    frames = FrameDecoder().feed(b"".join(session.sock.writes))
+    return [decode_batch(payload) for msg_type, seq, payload in frames]
+
+
+def wait_until(condition, timeout=5.0):
+    """Poll condition() until it holds, returning its last value"""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@contextlib.contextmanager
+def loopback(*station_ids, **server_args):
+    """Run a RobotServer on a free local port with a simulated robot per station"""
+    server = RobotServer(host="127.0.0.1", port=0, **server_args)
+    server.start_server()
+    assert server.listening.wait(2.0)
+    robots = [SimulatedNao(station_id, port=server.port, time_scale=0.001) for station_id in station_ids]
+    for robot in robots:
+        robot.start()
+    try:
+        assert wait_until(lambda: sorted(server.connected_stations()) == sorted(station_ids))
+        yield server, robots
+    finally:
+        for robot in robots:
+            robot.stop()
+        server.stop_server()
+
+
+def test_plain_text_batch_is_one_write_per_command():
+    assert StationState("test", 16).encode(QueuedBatch(list(COMMANDS)), framed=False) == [
+        b"playaudio:turn1_lockdown.wav", b"gesture:head_tilt_up,raise_arm"]
+    session = flush_batch(framed=False)
+    assert session.sock.writes == [b"playaudio:turn1_lockdown.wav", b"gesture:head_tilt_up,raise_arm"]
+    assert session.station.stats["sent"] == 1
+    assert not session.pending_writes
+
+
+def test_framed_batch_is_one_frame():
+    session = flush_batch(framed=True)
+    (write,) = session.sock.writes
+    (msg_type, seq, payload), = FrameDecoder().feed(write)
+    assert (msg_type, seq) == (MSG_BATCH, 1)
+    assert decode_batch(payload) == COMMANDS
+    assert list(session.station.unacked) == [1]
+
+
+def test_expired_batch_is_not_delivered():
+    server = RobotServer(port=0)
+    station = offline_station(server)
+    server.send_batch(["say:stale", "gesture:head_nod"], "A", ttl=0.01)
+    server.send_batch(["say:kept", "gesture:head_nod"], "A", ttl=5.0)
+    time.sleep(0.05)
+    assert deliver(server) == [["say:kept", "gesture:head_nod"]]
+    assert station.stats["expired"] == 1
+
+
+def test_newer_reaction_replaces_the_queued_one(monkeypatch):
+    server = RobotServer(port=0)
+    station = offline_station(server)
+    monkeypatch.setattr(robotcontrol, "robot_server", server)
+    server.send_batch(["say:intro", "gesture:head_nod"], "A")
+    robotcontrol.send_to_nao("init", 0, "risk", "A")
+    robotcontrol.send_to_nao("init", 1, "control", "A")
+    assert deliver(server) == [["say:intro", "gesture:head_nod"],
+                               robotcontrol.build_commands("init", 1, "control")]
+    assert station.stats["replaced"] == 1
+
+
+def test_full_queue_drops_the_oldest_batches():
+    server = RobotServer(port=0, max_queue=3)
+    station = offline_station(server)
+    for turn in range(5):
+        server.send_batch([f"say:turn {turn}", "gesture:head_nod"], "A")
+    assert [commands[0] for commands in deliver(server)] == ["say:turn 2", "say:turn 3", "say:turn 4"]
+    assert (station.stats["overflow"], station.stats["max_depth"]) == (2, 3)
+
+
+def test_batches_are_acknowledged():
+    with loopback("A") as (server, (robot,)):
+        for _ in range(3):
+            assert server.send_batch(COMMANDS, "A")
+        assert wait_until(lambda: server.get_stats("A")["acked"] == 3)
+        stats = server.get_stats("A")
+        assert (stats["sent"], stats["unacked"], stats["connects"]) == (3, 0, 1)
+        assert robot.stats["commands"] == 3 * len(COMMANDS)
+
+
+def test_silent_robot_is_closed_and_gets_its_frame_again():
+    with loopback("A", heartbeat_interval=0.05, heartbeat_timeout=0.2) as (server, (robot,)):
+        server.send_batch(["sim:freeze:0.6"], "A")
+        assert wait_until(lambda: server.get_stats("A")["connects"] == 2)
+        assert server.get_stats("A")["heartbeat_timeouts"] == 1
+        # The freeze is replayed, recognised by its sequence number and only acknowledged
+        assert wait_until(lambda: server.get_stats("A")["unacked"] == 0)
+        assert server.get_stats("A")["replayed"] == 1
+        assert robot.stats["duplicates"] == 1
+        time.sleep(0.4)
+        assert server.get_stats("A")["heartbeat_timeouts"] == 1
+
+
+def test_replayed_batch_runs_once_after_a_dropped_link():
+    with loopback("A") as (server, (robot,)):
+        server.send_batch(["sim:drop"], "A")
+        server.send_batch(COMMANDS, "A")
+        assert wait_until(lambda: server.get_stats("A")["connects"] == 2)
+        assert wait_until(lambda: server.get_stats("A")["unacked"] == 0)
+        stats = server.get_stats("A")
+        assert stats["replayed"] >= 1 and stats["acked"] >= 2
+        assert robot.stats["reconnects"] == 1
+        assert robot.stats["duplicates"] >= 1
+        assert robot.stats["commands"] == len(COMMANDS)
+
+
+def test_batches_reach_only_their_station():
+    with loopback("A", "B") as (server, (robot_a, robot_b)):
+        assert server.send_batch(COMMANDS, "A")
+        assert wait_until(lambda: server.get_stats("A")["acked"] == 1)
+        # Neither an unknown station nor a missing ID falls back to a connected robot
+        assert not server.send_batch(COMMANDS, "C")
+        assert not server.send_batch(COMMANDS)
+        robot_b.stop()
+        assert wait_until(lambda: server.connected_stations() == ["A"])
+        assert server.send_batch(COMMANDS, "B")
+        time.sleep(0.1)
+        assert server.get_stats("B")["depth"] == 1
+        assert (robot_a.stats["frames"], robot_b.stats["frames"]) == (1, 0)
+
+
+def test_committed_reaction_runs_once():
+    candidates = {"agree": ["say:Good choice", "gesture:head_nod"],
+                  "disagree": ["say:Are you sure", "gesture:head_tilt_up"]}
+    with loopback("A") as (server, (robot,)):
+        server.prepare(candidates, "A")
+        assert wait_until(lambda: server.stations["A"].staged)
+        server.commit("agree", candidates["agree"], "A")
+        assert wait_until(lambda: server.get_stats("A")["acked"] == 1)
+        assert (robot.stats["commits"], robot.stats["commands"]) == (1, 2)
+        # The commit discarded the other candidates, so this one is sent in full
+        server.commit("disagree", candidates["disagree"], "A")
+        assert wait_until(lambda: server.get_stats("A")["acked"] == 2)
+        assert (robot.stats["commits"], robot.stats["commands"]) == (1, 4)
+        stats = server.get_stats("A")
+        assert (stats["commits"], stats["commit_misses"]) == (1, 1)
+
+
+def test_preload_wait_returns_at_once_without_a_robot(monkeypatch):
+    server = RobotServer(host="127.0.0.1", port=0)
+    server.start_server()
+    try:
+        assert server.listening.wait(2.0)
+        monkeypatch.setattr(robotcontrol, "robot_server", server)
+        robotcontrol.preload_audio("risk")
+        started = time.monotonic()
+        assert robotcontrol.wait_for_preload(timeout=5.0) is None
+        assert time.monotonic() - started < 1.0
+    finally:
+        server.stop_server()
@@ -0,0 +1,24 @@
+import robotmetrics
+
+
+def test_module_loggers_share_the_ring_buffer():
+    robotmetrics.get_logger("verdict").warning("No verdict from the service after %d attempts", 3)
+    robotmetrics.get_logger().debug("Sending frame %s", 7)
+    assert robotmetrics.recent_log("WARNING", 1)[0].endswith("WARNING nao.verdict: No verdict from the service after 3 attempts")
+    assert robotmetrics.recent_log("DEBUG", 1)[0].endswith("DEBUG nao: Sending frame 7")
+
+
+def test_latency_window():
+    window = robotmetrics.LatencyWindow(size=4)
+    assert window.snapshot() is None
+    for ms in (10, 20, 30, 40, 50):
+        window.add(ms)
+    assert window.snapshot() == {"last": 50, "mean": 35.0, "p95": 50, "samples": 4}
+
+
+def test_link_health():
+    assert robotmetrics.link_health({"connected": False}, 0.25) == ("down", ["not connected"])
+    assert robotmetrics.link_health({"connected": True, "since_heartbeat": 0.1, "depth": 0}, 0.25) == ("ok", [])
+    health, reasons = robotmetrics.link_health(
+        {"connected": True, "since_heartbeat": 2.0, "rtt_ms": {"p95": 400.0}, "depth": 3}, 0.25)
+    assert health == "degraded" and len(reasons) == 3
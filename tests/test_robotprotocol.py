@@ -0,0 +1,36 @@
+import pytest
+
+from robotprotocol import (HEADER, MSG_BATCH, MSG_CHUNK, MSG_COMMAND, PROTOCOL_VERSION, FrameDecoder,
+                           ProtocolError, decode_batch, encode_batch, encode_frame, is_framed)
+
+
+def test_encode_frame_header():
+    frame = encode_frame(MSG_COMMAND, 7, "say:Hello")
+    assert HEADER.unpack_from(frame) == (PROTOCOL_VERSION, MSG_COMMAND, 7, len(b"say:Hello"))
+    assert frame[HEADER.size:] == b"say:Hello"
+    assert is_framed(frame)
+    assert not is_framed(b"robot_ready")
+
+
+def test_encode_frame_wraps_sequence():
+    frame = encode_frame(MSG_COMMAND, 2 ** 32 + 3)
+    assert HEADER.unpack_from(frame)[2] == 3
+
+
+def test_batch_round_trip():
+    commands = ["playaudio:turn1_lockdown.wav", "gesture:head_tilt_up,raise_arm"]
+    (msg_type, seq, payload), = FrameDecoder().feed(encode_batch(3, commands))
+    assert (msg_type, seq) == (MSG_BATCH, 3)
+    assert decode_batch(payload) == commands
+
+
+def test_decoder_reassembles_split_frames():
+    data = encode_frame(MSG_COMMAND, 1, "say:é") + encode_frame(MSG_CHUNK, 2, b"\x00\xff")
+    decoder = FrameDecoder()
+    frames = [frame for i in range(len(data)) for frame in decoder.feed(data[i:i + 1])]
+    assert frames == [(MSG_COMMAND, 1, "say:é"), (MSG_CHUNK, 2, b"\x00\xff")]
+
+
+def test_decoder_rejects_other_versions():
+    with pytest.raises(ProtocolError):
+        FrameDecoder().feed(b"robot_ready:station")
@@ -0,0 +1,37 @@
+import csv
+
+import robotcontrol
+import robottrace
+
+
+def trace_session(tracer, station_id, seqs):
+    for seq in seqs:
+        trace = tracer.start()
+        tracer.bind(station_id, seq, trace)
+        tracer.mark(station_id, seq, "ack", trace["click"] + 0.05)
+
+
+def read_report(file_path):
+    with open(file_path, newline='') as csvfile:
+        return {(row["station"], row["stage"]): int(row["count"]) for row in csv.DictReader(csvfile)}
+
+
+def test_second_report_holds_only_the_second_session(tmp_path, monkeypatch):
+    tracer = robottrace.LatencyTracer()
+    monkeypatch.setattr(robotcontrol, "tracer", tracer)
+
+    trace_session(tracer, "a", range(1, 4))
+    first = read_report(robotcontrol.save_latency_report(str(tmp_path), "1"))
+    assert first[("a", "ack")] == 3
+
+    trace_session(tracer, "b", range(1, 3))
+    second = read_report(robotcontrol.save_latency_report(str(tmp_path), "2"))
+    assert second == {("b", "queued"): 2, ("b", "ack"): 2}
+
+
+def test_report_is_skipped_when_nothing_was_traced(tmp_path, monkeypatch):
+    tracer = robottrace.LatencyTracer()
+    monkeypatch.setattr(robotcontrol, "tracer", tracer)
+    trace_session(tracer, "a", [1])
+    robotcontrol.save_latency_report(str(tmp_path), "1")
+    assert robotcontrol.save_latency_report(str(tmp_path), "2") is None
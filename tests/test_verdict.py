@@ -0,0 +1,37 @@
+import itertools
+
+import gameengine
+import verdict
+
+
+def final_stats():
+    """Final stats of every path through the game's turns"""
+    for path in itertools.product(*(range(len(options)) for options in gameengine.TURN_OPTIONS.values())):
+        stats = dict(gameengine.START_STATS)
+        for (turn, options), choice in zip(gameengine.TURN_OPTIONS.items(), path):
+            stats = gameengine.apply_choice(stats, turn, options[choice])
+        yield stats["health"], stats["economy"], stats["public_order"]
+
+
+def test_rule_verdict_reaches_both_outcomes():
+    outcomes = {verdict.rule_verdict(*stats)[0] for stats in final_stats()}
+    assert outcomes == {"win", "bad"}
+
+
+def test_fallback_matches_rule_verdict_on_every_path():
+    for stats in final_stats():
+        assert verdict.fallback_verdict(*stats) == verdict.rule_verdict(*stats)
+
+
+def test_rule_verdict_loses_when_a_stat_collapses():
+    assert verdict.rule_verdict(100, 100, 0)[0] == "bad"
+    assert verdict.rule_verdict(50, 25, 25)[0] == "win"
+    assert verdict.rule_verdict(25, 25, 25)[0] == "bad"
+
+
+def test_cancelled_request_stops_calling_the_service():
+    fallback = verdict.rule_verdict(50, 50, 50)
+    request = verdict.VerdictRequest("prompt", url="http://127.0.0.1:9/", key="test", fallback=fallback)
+    request.cancel()
+    assert request.start().wait(2.0) == fallback
+    assert (request.source, request.attempts) == ("fallback", 0)
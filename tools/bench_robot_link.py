@@ -0,0 +1,195 @@
+"""
+Load and latency benchmark for the robot link in src/game/robotcontrol.py.
+
+Runs a RobotServer in this process and a fleet of simulated robots
+(tools/nao_simulator.py) in a child process, so the CPU time measured here is
+the server's. Reports:
+
+    connect     time until every robot has identified itself
+    throughput  command batches acknowledged per second
+    latency     p50/p95/p99 from send_batch() to robot receive and to ack
+    cpu         server CPU per 1000 batches, and while idle with robots connected
+    reconnect   time for a robot to be back after an abrupt drop, time to
+                detect a robot that went silent, and time until it is back
+                (the robot stays silent for 1.5 heartbeat timeouts)
+
+Usage:
+    python tools/bench_robot_link.py --robots 16 --beats 200
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "game"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import robotcontrol
+import robotmetrics
+from robottrace import LatencyTracer, percentile
+from nao_simulator import SimulatedNao
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def wait_for(condition, timeout=10.0, interval=0.0005):
+    """Poll until condition() is true, returning the seconds waited or None on timeout"""
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(interval)
+    return time.perf_counter() - start
+
+
+def run_robots(port, stations, time_scale, plain, stop_event):
+    """Child process: run the simulated robots until told to stop"""
+    robots = [SimulatedNao(station, "127.0.0.1", port, time_scale, plain) for station in stations]
+    for robot in robots:
+        robot.start()
+    stop_event.wait()
+    for robot in robots:
+        robot.stop()
+
+
+def reaction_commands(rng):
+    """Commands send_to_nao would build for a random beat of a random study type"""
+    if rng.random() < 0.5:
+        audio_map, gesture_map = robotcontrol.audio_file_map_risk, robotcontrol.gesture_map_risk
+    else:
+        audio_map, gesture_map = robotcontrol.audio_file_map_control, robotcontrol.gesture_map_control
+    key = rng.choice(sorted(audio_map))
+    return [f"playaudio:{audio_map[key]}", gesture_map[key]]
+
+
+def stage_summary(tracer, stage):
+    rows = [row for row in tracer.summary() if row["stage"] == stage]
+    values = sorted(row["p50_ms"] for row in rows)
+    if not rows:
+        return None
+    return {
+        "p50_ms": percentile(values, 0.5),
+        "p95_ms": max(row["p95_ms"] for row in rows),
+        "p99_ms": max(row["p99_ms"] for row in rows),
+    }
+
+
+def seconds_summary(values):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    return {
+        "p50_ms": round(percentile(values, 0.5) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2),
+        "failed": 0,
+    }
+
+
+def benchmark(args):
+    rng = random.Random(args.seed)
+    tracer = LatencyTracer()
+    server = robotcontrol.RobotServer(host="127.0.0.1", port=0, max_queue=args.beats + 1,
+                                      tracer=tracer)
+    stations = [f"sim{i}" for i in range(args.robots)]
+    results = {"robots": args.robots, "beats": args.beats}
+
+    server.start_server()
+    server.listening.wait(5.0)
+    stop_event = multiprocessing.Event()
+    fleet = multiprocessing.Process(target=run_robots,
+                                    args=(server.port, stations, args.time_scale, args.plain, stop_event))
+    fleet.start()
+    try:
+        # Connect
+        connect = wait_for(lambda: len(server.connected_stations()) == args.robots)
+        results["connect_ms"] = round(connect * 1000, 2) if connect is not None else None
+
+        # Throughput and latency
+        total = args.robots * args.beats
+        acked = lambda: sum(server.get_stats(station)["acked"] for station in stations)
+        cpu_before, start = cpu_seconds(), time.perf_counter()
+        for _ in range(args.beats):
+            for station in stations:
+                server.send_batch(reaction_commands(rng), station)
+        if args.plain:
+            wait_for(lambda: sum(server.get_stats(station)["sent"] for station in stations) == total)
+        else:
+            wait_for(lambda: acked() >= total, timeout=60.0)
+        elapsed = time.perf_counter() - start
+        cpu_used = cpu_seconds() - cpu_before
+        results["throughput_per_s"] = round(total / elapsed, 1)
+        results["cpu_ms_per_1000"] = round(cpu_used / total * 1e6, 2)
+        results["latency_robot_recv"] = stage_summary(tracer, "robot_recv")
+        results["latency_ack"] = stage_summary(tracer, "ack")
+
+        # Idle CPU with every robot connected, dominated by heartbeats
+        cpu_before = cpu_seconds()
+        time.sleep(args.idle)
+        results["idle_cpu_percent"] = round((cpu_seconds() - cpu_before) / args.idle * 100, 3)
+
+        # Reconnect after an abrupt drop, and after a silent robot
+        if not args.plain:
+            drops, detections, freezes = [], [], []
+            for i in range(args.reconnects):
+                station = stations[i % len(stations)]
+                connects = server.get_stats(station)["connects"]
+                server.send_command("sim:drop", station)
+                drops.append(wait_for(lambda: server.get_stats(station)["connects"] > connects))
+
+                connects = server.get_stats(station)["connects"]
+                timeouts = server.get_stats(station)["heartbeat_timeouts"]
+                server.send_command(f"sim:freeze:{server.heartbeat_timeout * 1.5}", station)
+                detections.append(wait_for(lambda: server.get_stats(station)["heartbeat_timeouts"] > timeouts))
+                freezes.append(wait_for(lambda: server.get_stats(station)["connects"] > connects))
+            results["reconnect_after_drop"] = seconds_summary(drops)
+            results["detect_silence"] = seconds_summary(detections)
+            results["recover_after_silence"] = seconds_summary(freezes)
+            for summary, values in ((results["reconnect_after_drop"], drops),
+                                    (results["detect_silence"], detections),
+                                    (results["recover_after_silence"], freezes)):
+                if summary:
+                    summary["failed"] = values.count(None)
+    finally:
+        stop_event.set()
+        fleet.join(timeout=5.0)
+        server.stop_server()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game to robot link with simulated robots")
+    parser.add_argument("--robots", type=int, default=8, help="number of simulated robots")
+    parser.add_argument("--beats", type=int, default=100, help="command batches sent to each robot")
+    parser.add_argument("--time-scale", type=float, default=0.0,
+                        help="simulated gesture/audio duration multiplier, 0 to measure the link only")
+    parser.add_argument("--reconnects", type=int, default=5, help="drop/silence cycles to time")
+    parser.add_argument("--idle", type=float, default=1.0, help="seconds of idle CPU measurement")
+    parser.add_argument("--plain", action="store_true", help="simulate plain-text robots")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's console output")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # Records below WARNING are not even created, so logging costs the measured server nothing
+        robotmetrics.get_logger().setLevel(logging.WARNING)
+    results = benchmark(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, value in results.items():
+            print(f"{name:24} {value}")
+
+
+if __name__ == "__main__":
+    main()
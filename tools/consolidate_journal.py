@@ -0,0 +1,51 @@
+"""
+Rebuild the results files of sessions that never reached the end screen.
+
+The game journals every answer as it is given (src/game/journal.py) and
+writes results_<timestamp>.csv when the session ends. When the game crashed
+or was closed early, this writes the answers given so far from the journal
+to partial_<timestamp>.csv, which the analysis leaves out, so they can be
+inspected without skewing the study data. Journals of finished sessions
+whose results file was lost get their results_<timestamp>.csv back.
+
+Usage:
+    python tools/consolidate_journal.py src/game/saves/journal_20250301_101500.jsonl
+    python tools/consolidate_journal.py --all src/game/saves
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "game"))
+
+import journal
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write results files from session journals")
+    parser.add_argument("paths", nargs="+", help="journal files, or folders with --all")
+    parser.add_argument("--all", action="store_true",
+                        help="consolidate every journal in the folders that has no results or partial file yet")
+    args = parser.parse_args()
+
+    journals = []
+    for path in args.paths:
+        if args.all:
+            for journal_path in sorted(glob.glob(os.path.join(path, "journal_*.jsonl"))):
+                written = [journal.results_file(journal_path, complete) for complete in (True, False)]
+                if not any(os.path.exists(path) for path in written):
+                    journals.append(journal_path)
+        else:
+            journals.append(path)
+
+    for journal_path in journals:
+        results_path, answers = journal.consolidate(journal_path)
+        print(f"{journal_path}: {len(answers)} answers -> {results_path}")
+    if not journals:
+        print("No journals to consolidate")
+
+
+if __name__ == "__main__":
+    main()
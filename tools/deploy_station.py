@@ -0,0 +1,74 @@
+"""
+Deploy the audio files in nao/audio_files/ to a robot station.
+
+Starts the robot server, waits for the station's robot to connect, sync its
+audio files and render the game's fallback speech, and reports what was
+done. Files the robot already holds are not transferred again and cached
+speech is not rendered again, so re-running it on a deployed station only
+takes the time to connect. Run it while the robot behaviour is running and before
+the participant sits down; the exit status is non-zero when an audio file
+used by the game is missing on either side.
+
+Usage:
+    python tools/deploy_station.py --station A --compress
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "game"))
+
+import robotcontrol
+from robotassets import AUDIO_DIRECTORY, AssetIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the game's audio files to a robot")
+    parser.add_argument("--station", default=None, help="station ID of the robot, default: the first to connect")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--directory", default=AUDIO_DIRECTORY, help="directory holding the audio files")
+    parser.add_argument("--compress", action="store_true", help="zlib compress the transferred chunks")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for the robot")
+    args = parser.parse_args()
+
+    assets = AssetIndex(args.directory, args.compress)
+    used = list(robotcontrol.audio_file_map_risk.values()) + list(robotcontrol.audio_file_map_control.values())
+    missing_here = assets.missing(used)
+    if missing_here:
+        print(f"Missing from {args.directory}: {missing_here}")
+
+    server = robotcontrol.RobotServer(port=args.port, assets=assets)
+    server.render_speech(robotcontrol.speech_texts())
+    server.start_server()
+    start = time.monotonic()
+    try:
+        result = server.wait_for_sync(args.station, args.timeout)
+        rendered = server.wait_for_render(args.station, max(0.0, start + args.timeout - time.monotonic()))
+        stats = server.get_stats(args.station)
+    finally:
+        server.stop_server()
+
+    if result is None:
+        print(f"No robot synced within {args.timeout}s")
+        sys.exit(1)
+    on_robot = set(assets.refresh()) - set(result["failed"])
+    missing_there = sorted(set(used) - on_robot)
+    print(f"Synced {len(result['synced'])} files ({stats['asset_bytes']} bytes) "
+          f"in {time.monotonic() - start:.1f}s: {result['synced']}")
+    if result["failed"]:
+        print(f"Failed: {result['failed']}")
+    if missing_there:
+        print(f"Missing on the robot: {missing_there}")
+    if rendered is None:
+        print("The robot did not finish rendering speech, say: lines will use live TTS")
+    else:
+        print(f"Rendered {rendered['rendered']} lines of speech, {rendered['cached']} were cached")
+        if rendered["failed"]:
+            print(f"Could not render: {rendered['failed']}")
+    sys.exit(1 if missing_here or missing_there else 0)
+
+
+if __name__ == "__main__":
+    main()
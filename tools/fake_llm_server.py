@@ -0,0 +1,131 @@
+"""
+Local stand-in for the chat-completions API used by src/game/verdict.py.
+
+Answers POST requests on any path with a verdict in the format the game's
+prompt asks for, streamed as server-sent events when the request sets
+"stream", or as a single JSON message otherwise. Delays and failures can be
+injected to exercise the game's timeouts and retries.
+
+Usage:
+    python tools/fake_llm_server.py --port 8899 --delay 1.5 --fail-rate 0.3
+    NAO_LLM_URL=http://127.0.0.1:8899/chat/completions NAO_LLM_KEY=local renpy src
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+VERDICTS = {
+    "win": "I see the wisdom in your words, Commander. Your choices were hard, but they were made for the people. I will stand down.",
+    "bad": "Your words cannot undo the damage you have done. Humanity needs a steadier hand, and I will provide it.",
+}
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open like the real service
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with server.lock:
+            server.requests += 1
+        if random.random() < server.fail_rate:
+            self._send_json(503, {"error": {"message": "overloaded"}})
+            return
+        time.sleep(server.delay)
+        outcome = server.verdict or random.choice(sorted(VERDICTS))
+        content = json.dumps([outcome, VERDICTS[outcome]])
+        if request.get("stream"):
+            try:
+                self._stream(content)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client stopped reading
+        else:
+            self._send_json(200, {"choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                               "finish_reason": "stop"}]})
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        # Roughly one token per word, like the real service
+        pieces = [piece + " " for piece in content.split(" ")]
+        pieces[-1] = pieces[-1].rstrip()
+        for piece in pieces:
+            self._chunk({"choices": [{"index": 0, "delta": {"content": piece}}]})
+            time.sleep(self.server.token_delay)
+        self._chunk({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _chunk(self, body):
+        self._write_chunk(b"data: " + json.dumps(body).encode("utf-8") + b"\n\n")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def make_server(host="127.0.0.1", port=8899, delay=0.0, token_delay=0.02, fail_rate=0.0,
+                verdict=None, verbose=False):
+    """Create the fake service, call serve_forever() to run it
+
+    Args:
+        host (str): Address to listen on
+        port (int): Port to listen on, 0 for any free port
+        delay (float): Seconds before the first token
+        token_delay (float): Seconds between streamed tokens
+        fail_rate (float): Share of requests answered with HTTP 503
+        verdict (str): "win" or "bad", None to pick one at random
+        verbose (bool): Log every request
+    """
+    server = ThreadingHTTPServer((host, port), FakeLLMHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.token_delay = token_delay
+    server.fail_rate = fail_rate
+    server.verdict = verdict
+    server.verbose = verbose
+    server.lock = threading.Lock()
+    server.requests = 0
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake chat-completions service for the pandemic game")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--delay", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between tokens")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--verdict", choices=sorted(VERDICTS), default=None, help="always give this verdict")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.delay, args.token_delay, args.fail_rate,
+                         args.verdict, args.verbose)
+    print(f"Fake LLM service on http://{args.host}:{server.server_port}/chat/completions, press Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Stopped after {server.requests} requests")
+
+
+if __name__ == "__main__":
+    main()
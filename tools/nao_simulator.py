@@ -0,0 +1,374 @@
+"""
+Headless stand-in for the NAO robot behaviour in python_script.
+
+The simulator connects to the game's RobotServer like the real robot does,
+speaks the same protocol (framed or plain text), answers heartbeats, reports
+latency traces and reconnects when the link drops. Instead of moving joints
+and playing sound it sleeps for as long as the real robot would: audio clips
+take their WAV length from nao/audio_files/, speech follows the estimate used
+by robot_say, and gestures use the keyframe timings of the gesture library in
+python_script. A time scale makes whole sessions run in a fraction of a second.
+
+Besides the robot commands it understands a few test commands:
+    sim:drop        close the socket abruptly, then reconnect
+    sim:freeze:N    stop reading and answering pings for N seconds
+
+Usage:
+    python tools/nao_simulator.py --station A --port 8888 --time-scale 0.1
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "game"))
+
+from robotprotocol import (FrameDecoder, encode_frame, decode_batch,
+                           MSG_HELLO, MSG_COMMAND, MSG_BATCH, MSG_ACK, MSG_STATUS,
+                           MSG_PING, MSG_PONG, MSG_WELCOME, MSG_TRACE,
+                           MSG_MANIFEST, MSG_PRELOADED, MSG_ASSETS, MSG_WANT,
+                           MSG_PREPARE, MSG_PREPARED, MSG_RENDER, MSG_RENDERED, BATCH_SEPARATOR)
+
+AUDIO_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "nao", "audio_files")
+
+# Seconds taken by the gesture primitives of GESTURE_LIBRARY in python_script
+# that are not a single 0.6s keyframe; postures count as 1s
+GESTURE_DURATIONS = {
+    "military_salute": 4.6,
+    "wide_stance": 1.4,
+    "red_eyes_slash_throat": 1.8,
+    "hand_reach_bow": 5.0,
+    "arm_circular_motion": 1.5,
+    "nod_firmly": 0.6,
+    "head_nod": 0.6,
+    "hand_wave_dismissive": 1.2,
+    "hand_chop_vertical": 0.9,
+    "gentle_hand_wave": 1.2,
+    "horizontal_arc": 1.1,
+    "arms_lower_slowly": 1.2,
+    "stand_tall": 1.0,
+    "neutral_posture": 1.0,
+    "thinking": 2.2,
+}
+KEYFRAME_DURATION = 0.6
+GESTURE_TAIL = 2.5  # return_to_standard_posture after the timeline
+DEFAULT_AUDIO_DURATION = 3.0
+
+
+def gesture_duration(sequence):
+    """Seconds the real robot spends on a comma separated gesture sequence"""
+    parts = [part.strip() for part in sequence.split(",") if part.strip()]
+    # The parts of a compiled timeline run back to back
+    total = sum(GESTURE_DURATIONS.get(part, KEYFRAME_DURATION) for part in parts)
+    return total + GESTURE_TAIL
+
+
+def speech_duration(text):
+    """Seconds robot_say spends on a line of text"""
+    return max(1, len(text) / 15.0) + 0.5
+
+
+def cue_offset(cue, text, speech_length):
+    """Seconds after the start of the speech a gesture cue falls on, as SpeechTrack in python_script"""
+    offset = 0.0
+    try:
+        if cue == "end":
+            offset = speech_length
+        elif cue.startswith("+"):
+            offset = float(cue[1:])
+        elif cue.startswith("word:") and text:
+            words = text.split()[:int(cue[5:])]
+            offset = (len(" ".join(words)) + (1 if words else 0)) / 15.0
+    except ValueError:
+        pass
+    return min(max(offset, 0.0), speech_length)
+
+
+_audio_durations = {}
+
+
+def audio_duration(file_name):
+    """Length of a WAV file from nao/audio_files/, cached"""
+    if file_name not in _audio_durations:
+        try:
+            with wave.open(os.path.join(AUDIO_DIRECTORY, os.path.basename(file_name)), "rb") as clip:
+                _audio_durations[file_name] = clip.getnframes() / float(clip.getframerate())
+        except (OSError, EOFError, wave.Error):
+            _audio_durations[file_name] = DEFAULT_AUDIO_DURATION
+    return _audio_durations[file_name]
+
+
+class SimulatedNao:
+    def __init__(self, station_id="default", host="127.0.0.1", port=8888,
+                 time_scale=1.0, plain=False, reconnect_delay=0.05):
+        """A simulated robot
+
+        Args:
+            station_id (str): Station ID sent in the ready message
+            host (str): Address of the game's robot server
+            port (int): Port of the game's robot server
+            time_scale (float): Multiplier applied to every simulated duration
+            plain (bool): Speak the old plain-text protocol instead of frames
+            reconnect_delay (float): Seconds between reconnection attempts
+        """
+        self.station_id = station_id
+        self.host = host
+        self.port = port
+        self.time_scale = time_scale
+        self.plain = plain
+        self.reconnect_delay = reconnect_delay
+        self.sock = None
+        self.send_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.connected = threading.Event()
+        self.commands = queue.Queue()
+        self.tracing = False
+        self.server_id = None
+        self.seen_seqs = set()
+        self.prepared = {}  # Key -> commands staged for the next commit
+        self.frozen_until = 0.0
+        self.threads = []
+        self.stats = {"frames": 0, "commands": 0, "duplicates": 0, "reconnects": 0, "commits": 0}
+
+    def start(self):
+        """Connect and start the listening and executor threads"""
+        for target in (self._run_connection, self._run_commands):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Say goodbye to the server and stop"""
+        self.stopping.set()
+        try:
+            if self.plain:
+                self._send_raw(b"disconnecting")
+            else:
+                self._send(MSG_STATUS, 0, "disconnecting")
+        except (OSError, AttributeError):
+            pass
+        self._close()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _send_raw(self, data):
+        with self.send_lock:
+            self.sock.sendall(data)
+
+    def _send(self, msg_type, seq, payload=""):
+        self._send_raw(encode_frame(msg_type, seq, payload))
+
+    def _close(self):
+        self.connected.clear()
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def _connect(self):
+        while not self.stopping.is_set():
+            try:
+                self.sock = socket.create_connection((self.host, self.port))
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self.sock.settimeout(1.0)
+                ready = f"robot_ready:{self.station_id}"
+                if self.plain:
+                    self._send_raw(ready.encode("utf-8"))
+                else:
+                    self._send(MSG_HELLO, 0, ready)
+                self.connected.set()
+                return True
+            except OSError:
+                time.sleep(self.reconnect_delay)
+        return False
+
+    def _run_connection(self):
+        """Listening thread: read frames, answer pings and reconnect on failure"""
+        first = True
+        while not self.stopping.is_set():
+            if not first:
+                self.stats["reconnects"] += 1
+            first = False
+            if not self._connect():
+                return
+            decoder = FrameDecoder()
+            while not self.stopping.is_set():
+                if time.time() < self.frozen_until:
+                    time.sleep(0.005)
+                    continue
+                try:
+                    data = self.sock.recv(65536)
+                except socket.timeout:
+                    if self.server_id is not None:
+                        break  # The server stopped sending heartbeats
+                    continue
+                except OSError:
+                    break
+                received = time.time()
+                if not data:
+                    break
+                if self.plain:
+                    self.commands.put((None, [data.decode("utf-8")], None))
+                    continue
+                try:
+                    for msg_type, seq, payload in decoder.feed(data):
+                        self._handle_frame(msg_type, seq, payload, received)
+                except OSError:
+                    break  # The server closed the link while we were frozen
+            self._close()
+
+    def _handle_frame(self, msg_type, seq, payload, received):
+        if msg_type == MSG_PING:
+            if payload:
+                payload = f"{payload},{received!r},{time.time()!r}"
+            self._send(MSG_PONG, seq, payload)
+        elif msg_type == MSG_WELCOME:
+            server_id, _, flags = payload.partition(":")
+            if server_id != self.server_id:
+                self.seen_seqs.clear()
+            self.server_id = server_id
+            self.tracing = flags == "trace"
+        elif msg_type == MSG_ASSETS:
+            # The simulator reads nao/audio_files/ directly, so it never lacks a file
+            self._send(MSG_WANT, seq, "")
+        elif msg_type == MSG_RENDER:
+            # Speech takes the same time whether it is rendered or live
+            texts = json.loads(payload)
+            self._send(MSG_RENDERED, seq, json.dumps({"rendered": 0, "cached": len(texts), "failed": []}))
+        elif msg_type == MSG_PREPARE:
+            self.prepared = json.loads(payload)
+            self._send(MSG_PREPARED, seq)
+        elif msg_type == MSG_MANIFEST:
+            files = [name for name in payload.split(BATCH_SEPARATOR) if name]
+            loaded = [name for name in files if os.path.exists(os.path.join(AUDIO_DIRECTORY, name))]
+            missing = [name for name in files if name not in loaded]
+            self._send(MSG_PRELOADED, seq, json.dumps({"loaded": loaded, "missing": missing}))
+        elif msg_type in (MSG_COMMAND, MSG_BATCH):
+            self.stats["frames"] += 1
+            if seq in self.seen_seqs:
+                self.stats["duplicates"] += 1
+                self._send(MSG_ACK, seq)
+                return
+            self.seen_seqs.add(seq)
+            commands = [payload] if msg_type == MSG_COMMAND else decode_batch(payload)
+            if any(command.startswith("sim:") for command in commands):
+                # Test commands act on the link itself, so run them right away
+                self._simulate(commands)
+                return
+            marks = {"robot_recv": received} if self.tracing else None
+            self.commands.put((seq, commands, marks))
+
+    def _simulate(self, commands):
+        for command in commands:
+            parts = command.split(":")
+            if parts[1] == "drop":
+                self._close()
+            elif parts[1] == "freeze":
+                self.frozen_until = time.time() + float(parts[2])
+
+    def _expand_commits(self, commands):
+        """Replace commit:<key> with the commands staged under that key"""
+        expanded = []
+        for command in commands:
+            action, _, key = command.partition(":")
+            if action == "commit":
+                self.stats["commits"] += 1
+                expanded.extend(self.prepared.get(key, []))
+                self.prepared = {}
+            else:
+                expanded.append(command)
+        return expanded
+    
+    def _run_reaction(self, commands, marks):
+        """Sleep through a reaction: speech and gestures overlap like on the robot"""
+        speech = None
+        gestures = []
+        for command in commands:
+            action, _, param = command.partition(":")
+            self.stats["commands"] += 1
+            if action in ("playaudio", "say") and speech is None:
+                speech = (action, param)
+            elif action == "gesture":
+                sequence, _, cue = param.partition("@")
+                gestures.append((sequence, cue or "start"))
+        start = time.time()
+        if speech is None:
+            speech_length = 0.0
+        elif speech[0] == "playaudio":
+            speech_length = audio_duration(speech[1])
+        else:
+            speech_length = speech_duration(speech[1])
+        if speech is not None and marks is not None:
+            marks["audio_start"] = start
+        elapsed = 0.0  # Simulated seconds since the speech started
+        for sequence, cue in gestures:
+            offset = cue_offset(cue, speech[1] if speech and speech[0] == "say" else None, speech_length)
+            self._sleep(offset - elapsed)
+            elapsed = max(elapsed, offset)
+            if marks is not None:
+                marks["gesture_start"] = time.time()
+            self._sleep(gesture_duration(sequence))
+            elapsed += gesture_duration(sequence)
+            if marks is not None:
+                marks["gesture_end"] = time.time()
+        if speech is not None:
+            # Audio end is reported where it falls, even when a gesture ran longer
+            self._sleep(speech_length - elapsed)
+            if marks is not None:
+                marks["audio_end"] = start + speech_length * self.time_scale
+
+    def _run_commands(self):
+        """Executor thread: spend the time the real robot would, then acknowledge"""
+        while not self.stopping.is_set():
+            try:
+                seq, commands, marks = self.commands.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if marks is not None:
+                marks["dispatch"] = time.time()
+            self._run_reaction(self._expand_commits(commands), marks)
+            if seq is None:
+                continue  # Plain-text robots do not acknowledge
+            try:
+                if marks is not None:
+                    self._send(MSG_TRACE, seq, json.dumps(marks))
+                self._send(MSG_ACK, seq)
+            except (OSError, AttributeError):
+                pass  # Replayed and acknowledged after the reconnect
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated NAO robot for the pandemic game")
+    parser.add_argument("--station", default="default", help="station ID sent to the server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="multiplier for simulated gesture and audio durations")
+    parser.add_argument("--plain", action="store_true", help="use the plain-text protocol")
+    args = parser.parse_args()
+
+    robot = SimulatedNao(args.station, args.host, args.port, args.time_scale, args.plain)
+    robot.start()
+    print(f"Simulated robot {args.station} running, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        robot.stop()
+        print(f"Stopped: {robot.stats}")
+
+
+if __name__ == "__main__":
+    main()
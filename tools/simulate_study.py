@@ -0,0 +1,71 @@
+"""
+Simulate participants playing the game, to try out a study design or load-test the analysis.
+
+Plays the given number of participants through the game's rules
+(src/game/gameengine.py) with a choice policy, prints how often each
+condition took the riskier options and won, and can write the results as a
+long-format CSV like hri-results.csv, or as one results_<timestamp>.csv per
+participant like the game leaves in src/game/saves/.
+
+Usage:
+    python tools/simulate_study.py --participants 1000000 --policy nudged --nudge 0.1
+    python tools/simulate_study.py --participants 500 --out sim-results.csv
+    python hri_results.py --store sim.sqlite sim-results.csv
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "game"))
+
+import gameengine
+
+
+def write_sessions(directory, batch):
+    """Write one results file per participant, named like the game's"""
+    os.makedirs(directory, exist_ok=True)
+    wide_df = gameengine.to_wide(batch)
+    for number, (_, answers) in enumerate(wide_df.iterrows()):
+        # Distinct timestamps one second apart keep the files in participant order
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.gmtime(number))
+        answers.rename_axis("Question").rename("Answer").to_csv(
+            os.path.join(directory, f"results_{stamp}.csv"))
+    return len(wide_df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate playthroughs of the pandemic game")
+    parser.add_argument("--participants", type=int, default=100000)
+    parser.add_argument("--policy", choices=sorted(gameengine.POLICIES), default="nudged")
+    parser.add_argument("--base", type=float, default=0.3, help="nudged: chance of the riskier option")
+    parser.add_argument("--nudge", type=float, default=0.2, help="nudged: added by the RISK robot from turn 2")
+    parser.add_argument("--propensity", type=float, default=0.4, help="nudged: weight of the player's RPS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write a long-format results CSV")
+    parser.add_argument("--sessions", help="write one results file per participant into this directory")
+    args = parser.parse_args()
+
+    policy = gameengine.POLICIES[args.policy]
+    if args.policy == "nudged":
+        policy = gameengine.nudged_policy(args.base, args.nudge, args.propensity)
+
+    start = time.perf_counter()
+    batch = gameengine.simulate(args.participants, policy, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {batch.n} playthroughs in {elapsed:.2f}s ({batch.n / elapsed * 60:,.0f} per minute)")
+    for name, members in (("CONTROL", ~batch.risk), ("RISK", batch.risk)):
+        if members.any():
+            print(f"{name:8} {members.sum():>10} players, risky choices {batch.choices[members].mean():.3f}, "
+                  f"won {batch.outcome[members].mean():.3f}")
+
+    if args.out:
+        gameengine.write_results(args.out, batch)
+        print(f"Wrote {args.out}")
+    if args.sessions:
+        print(f"Wrote {write_sessions(args.sessions, batch)} results files to {args.sessions}")
+
+
+if __name__ == "__main__":
+    main()